@@ -0,0 +1,465 @@
+"""
+Company analysis pipeline: search, fetch, inference, comparative analysis and Hindi speech.
+
+Every blocking step is dispatched to the executors in workers.py so the event
+loop stays free while an analysis runs. analyze_companies runs several companies
+at once, sharing the fetch and the model batches between them.
+Every entry point takes an optional summarization mode ("fast", "balanced" or
+"quality", see utils.SUMMARY_TIER); analyses are cached per company and mode.
+"""
+import asyncio
+import logging
+import os
+
+import cache
+import dedup
+import metrics
+import store
+import translation
+import utils
+import workers
+
+logger = logging.getLogger(__name__)
+
+# Bulk analysis: companies per request and fetch threads shared by all of them
+BULK_MAX_COMPANIES = int(os.environ.get("BULK_MAX_COMPANIES", 50))
+BULK_FETCH_WORKERS = int(os.environ.get("BULK_FETCH_WORKERS", 32))
+# Articles per bulk inference job, so single-company jobs queue behind at most one
+BULK_INFERENCE_BATCH = int(os.environ.get("BULK_INFERENCE_BATCH", 32))
+
+
+def summary_template(company_name, comparative_analysis):
+    """
+    The summary read out in the Hindi audio as a template with {name}
+    placeholders and their values, so its sentences translate once for all
+    companies (see translation.py)
+    """
+    sentiment_distribution = comparative_analysis["sentiment_distribution"]
+    common_topics = comparative_analysis["common_topics"]
+    values = {
+        "company": company_name,
+        "total": comparative_analysis['total_articles'],
+        "positive": sentiment_distribution.get('Positive', 0),
+        "negative": sentiment_distribution.get('Negative', 0),
+        "neutral": sentiment_distribution.get('Neutral', 0),
+        "topics": [topic for topic, _ in common_topics[:5]],
+        "score": f"{comparative_analysis['average_sentiment_score']:.2f}"
+    }
+
+    template = "Analysis for {company}:\n"
+    template += "A total of {total} articles were analyzed.\n"
+
+    # Discuss sentiment distribution
+    template += "Sentiment distribution: "
+    template += "{positive} positive articles, "
+    template += "{negative} negative articles, and "
+    template += "{neutral} neutral articles.\n"
+
+    # Discuss common topics
+    if common_topics:
+        template += "The most frequently discussed topics were: {topics}.\n"
+
+    # Add overall sentiment score
+    template += "The average sentiment score across all articles was {score}.\n"
+    return template, values
+
+def build_summary_text(company_name, comparative_analysis):
+    """Generate the detailed English summary read out in the Hindi audio"""
+    return translation.fill_template(*summary_template(company_name, comparative_analysis))
+
+def no_articles_result(company_name):
+    return {
+        "message": "No valid articles found",
+        "fallback": True,
+        "articles": [],
+        "company": company_name
+    }
+
+def _article_record(article, summary, sentiment, topics, duplicate_urls=None):
+    return {
+        'title': article['title'],
+        'url': article['url'],
+        'summary': summary,
+        'sentiment': sentiment,
+        'topics': topics,
+        'duplicate_urls': list(duplicate_urls or []),
+        'fetched_at': article.get('fetched_at')
+    }
+
+async def _finish_analysis(company_name, valid_articles, common_topics, summary_stats=None):
+    """Comparative analysis, summary text and Hindi speech for processed articles"""
+    # Perform comparative analysis
+    comparative_analysis = utils.perform_comparative_analysis(
+        valid_articles, common_topics=common_topics)
+    template, values = summary_template(company_name, comparative_analysis)
+    summary_text = translation.fill_template(template, values)
+
+    # Generate Hindi translation and speech; the audio is served from /audio/{audio_id}
+    with metrics.span("speech"):
+        audio_id, hindi_text = await workers.run_io(utils.generate_hindi_speech, template, values)
+
+    result = {
+        "company": company_name,
+        "articles": valid_articles,
+        "comparative_analysis": comparative_analysis,
+        "summary_text": summary_text,
+        "hindi_text": hindi_text,
+        "audio_id": audio_id,
+        "audio_url": f"/audio/{audio_id}" if audio_id else None
+    }
+    if summary_stats is not None:
+        result["summarization_stats"] = summary_stats
+
+    # Keep the per-article records for historical queries (see store.py)
+    await workers.run_io(store.record_articles, company_key(company_name), company_name,
+                         valid_articles)
+
+    # Preprocess the result to remove any problematic float values
+    return utils.preprocess_data(result)
+
+async def analyze_company(company_name, mode=None):
+    """Run the full analysis for one company and return the response payload"""
+    with metrics.span("analysis"):
+        # Search for news articles
+        articles = await workers.run_io(utils.search_news, company_name)
+
+        # Fetch all articles concurrently; slow publishers are dropped at the deadline
+        with metrics.span("fetch"):
+            fetched_articles = await workers.run_io(utils.fetch_articles, articles)
+
+        # Filter short content
+        candidates = [article for article in fetched_articles if len(article['content']) > 100]
+        metrics.count_articles("too_short", len(fetched_articles) - len(candidates))
+        if not candidates:
+            return no_articles_result(company_name)
+
+        # Syndicated copies are scored once, on the first article of each cluster
+        duplicate_urls = [[] for _ in candidates]
+        if dedup.DEDUP_ENABLED:
+            with metrics.span("dedup"):
+                candidates, duplicate_urls = await workers.run_inference(dedup.deduplicate, candidates)
+            metrics.count_articles("duplicate", sum(len(urls) for urls in duplicate_urls))
+        contents = [article['content'] for article in candidates]
+
+        # Run each model once over all articles on the inference executor
+        with metrics.span("inference"):
+            summaries, summary_stats, sentiments, topic_result = await workers.run_inference(
+                utils.infer_articles, contents, utils.summary_tier(mode))
+        metrics.count_articles("analyzed", len(contents))
+
+        valid_articles = [
+            _article_record(article, summary, sentiment, topics, duplicates)
+            for article, summary, sentiment, topics, duplicates in zip(
+                candidates, summaries, sentiments, topic_result['topics'], duplicate_urls)
+        ]
+        return await _finish_analysis(company_name, valid_articles,
+                                      topic_result['common_topics'], summary_stats)
+
+async def stream_analysis(company_name, mode=None):
+    """
+    Run the analysis for one company as an async generator of events:
+    "search" with the candidate URLs, one "article" per processed article as soon
+    as it is ready, then "result" with the full payload of analyze_company.
+    Articles that finish fetching together are micro-batched into one
+    inference call; topics in "article" events are provisional until "result".
+    In "balanced" mode the most central articles are picked within each batch.
+    """
+    # Search for news articles
+    urls = await workers.run_io(utils.search_news, company_name)
+    yield {"event": "search", "company": company_name, "urls": urls}
+
+    # Fetch in the background, handing each article over as soon as it is extracted
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def fetch():
+        try:
+            for article in utils.iter_fetched_articles(urls):
+                loop.call_soon_threadsafe(queue.put_nowait, article)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    fetch_task = asyncio.ensure_future(workers.run_io(fetch))
+    candidates, summaries, sentiments, summary_stats = [], [], [], []
+    duplicate_urls = {}
+    # MinHash signatures of the streamed articles, so each article is hashed once
+    seen_signatures = []
+    fetching = True
+    try:
+        while fetching:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            if None in batch:
+                fetching = False
+            # Filter short content
+            fetched = [article for article in batch if article is not None]
+            batch = [article for article in fetched if len(article['content']) > 100]
+            metrics.count_articles("too_short", len(fetched) - len(batch))
+
+            # Attach syndicated copies to the article already streamed for their cluster
+            if dedup.DEDUP_ENABLED and batch:
+                with metrics.span("dedup"):
+                    matches, signatures = await workers.run_inference(
+                        dedup.match_new_articles, batch, seen_signatures)
+                unique, index_of = [], {}
+                for i, (article, match) in enumerate(zip(batch, matches)):
+                    if match is None:
+                        index_of[len(candidates) + i] = len(candidates) + len(unique)
+                        unique.append(article)
+                        seen_signatures.append(signatures[i])
+                        continue
+                    # Matches past the streamed articles point into this batch
+                    target = index_of.get(match, match)
+                    metrics.count_articles("duplicate")
+                    duplicate_urls.setdefault(target, []).append(article['url'])
+                    if target < len(candidates):
+                        yield {"event": "duplicate", "index": target, "url": article['url']}
+                batch = unique
+            if not batch:
+                continue
+
+            with metrics.span("inference"):
+                batch_summaries, batch_stats, batch_sentiments, batch_topics = await workers.run_inference(
+                    utils.infer_articles, [article['content'] for article in batch],
+                    utils.summary_tier(mode))
+            metrics.count_articles("analyzed", len(batch))
+            summary_stats.append(batch_stats)
+            for article, summary, sentiment, topics in zip(batch, batch_summaries,
+                                                           batch_sentiments,
+                                                           batch_topics['topics']):
+                candidates.append(article)
+                summaries.append(summary)
+                sentiments.append(sentiment)
+                index = len(candidates) - 1
+                yield {
+                    "event": "article",
+                    "index": index,
+                    "article": utils.preprocess_data(_article_record(
+                        article, summary, sentiment, topics, duplicate_urls.get(index)))
+                }
+        await fetch_task
+    finally:
+        fetch_task.cancel()
+
+    if not candidates:
+        yield {"event": "result", **no_articles_result(company_name)}
+        return
+
+    # Final topics come from one fit over every article, as in analyze_company
+    with metrics.span("inference"):
+        topic_result = await workers.run_inference(
+            utils.extract_topics_corpus, [article['content'] for article in candidates])
+    valid_articles = [
+        _article_record(article, summary, sentiment, topics, duplicate_urls.get(i))
+        for i, (article, summary, sentiment, topics) in enumerate(
+            zip(candidates, summaries, sentiments, topic_result['topics']))
+    ]
+    result = await _finish_analysis(company_name, valid_articles, topic_result['common_topics'],
+                                    utils.merge_summary_stats(summary_stats))
+    cache.analysis_cache.set(_result_key(company_name, mode), result)
+    yield {"event": "result", **result}
+
+def company_key(company_name):
+    """Normalized company name used to key analyses, stored articles and watches"""
+    return " ".join(company_name.lower().split())
+
+def _result_key(company_name, mode=None):
+    """Analysis cache key: the company and the summarization mode"""
+    return f"{company_key(company_name)}|{utils.summary_tier(mode)}"
+
+async def get_cached_analysis(company_name, mode=None):
+    """
+    Return the cached analysis for the company, or None. Audio evicted from the
+    in-memory audio cache (or lost in a restart) is re-synthesized under the same id.
+    """
+    result = cache.analysis_cache.get(_result_key(company_name, mode))
+    if result is not None and result.get("audio_id") and utils.get_speech(result["audio_id"]) is None:
+        await workers.run_io(utils.synthesize_speech, result["hindi_text"], 'hi')
+    return result
+
+async def cached_analysis(company_name, mode=None):
+    """
+    Return a cached analysis for the company, or compute it under the admission
+    limit. Concurrent requests for the same company share one computation.
+    """
+    key = _result_key(company_name, mode)
+    result = await get_cached_analysis(company_name, mode)
+    if result is not None:
+        return result
+
+    async def compute():
+        async with workers.admission:
+            result = await analyze_company(company_name, mode)
+        if not result.get("fallback"):
+            cache.analysis_cache.set(key, result)
+        return result
+
+    return await cache.analysis_flight.run(key, compute)
+
+async def iter_company_analyses(company_names, mode=None):
+    """
+    Analyze several companies together, yielding (company_name, result) as each
+    one completes; cached analyses come first. Searches run concurrently, the
+    union of their URLs is fetched once, and near-duplicate clustering runs over
+    every article, so an article found for several companies is fetched and
+    scored once. Topics are still fitted per company. Model inference runs in
+    jobs of at most BULK_INFERENCE_BATCH articles, so other analyses are not
+    stalled behind one large job. Companies already being analyzed are joined
+    rather than analyzed again, and single requests arriving meanwhile join the
+    bulk computation (see cache.analysis_flight). The caller holds admission.
+    """
+    names, keys = [], set()
+    for name in company_names:
+        key = company_key(name)
+        if key and key not in keys:
+            keys.add(key)
+            names.append(name)
+
+    claims, joined = {}, []
+    try:
+        for name in names:
+            result = await get_cached_analysis(name, mode)
+            if result is not None:
+                yield name, result
+                continue
+            key = _result_key(name, mode)
+            task = cache.analysis_flight.pending(key)
+            if task is not None:
+                joined.append((name, task))
+            else:
+                claims[name] = cache.analysis_flight.claim(key)
+
+        async for name, result in _analyze_pending(list(claims), mode, claims, joined):
+            yield name, result
+    finally:
+        for future in claims.values():
+            if not future.done():
+                _fail_claim(future, RuntimeError("Bulk analysis did not complete"))
+
+def _fail_claim(future, error):
+    future.set_exception(error)
+    # Waiters get the error; without waiters it is not logged as unretrieved
+    future.exception()
+
+async def _join_flight(name, task):
+    return name, await asyncio.shield(task)
+
+async def _analyze_pending(pending, mode, claims, joined):
+    """The bulk analysis of iter_company_analyses for the companies not cached or in flight"""
+    if not pending:
+        for finished in asyncio.as_completed([_join_flight(*item) for item in joined]):
+            yield await finished
+        return
+
+    # Search for every company at once
+    url_lists = await asyncio.gather(*(workers.run_io(utils.search_news, name) for name in pending))
+
+    # Fetch the union of the results in one pool
+    urls = list(dict.fromkeys(url for url_list in url_lists for url in url_list))
+    with metrics.span("fetch"):
+        fetched_articles = await workers.run_io(utils.fetch_articles, urls, BULK_FETCH_WORKERS)
+    articles = [article for article in fetched_articles if len(article['content']) > 100]
+    metrics.count_articles("too_short", len(fetched_articles) - len(articles))
+    index_of = {article['url']: i for i, article in enumerate(articles)}
+
+    # Cluster across companies; each cluster is scored once, on its first article
+    if dedup.DEDUP_ENABLED and articles:
+        with metrics.span("dedup"):
+            labels = await workers.run_inference(
+                dedup.cluster_near_duplicates, [article['content'] for article in articles])
+    else:
+        labels = list(range(len(articles)))
+    scored = sorted(set(labels))
+    position = {label: k for k, label in enumerate(scored)}
+    metrics.count_articles("duplicate", len(articles) - len(scored))
+
+    # Each company keeps its articles in search order, one per cluster
+    companies = []
+    for name, url_list in zip(pending, url_lists):
+        members, duplicate_urls, slot = [], [], {}
+        for url in url_list:
+            i = index_of.get(url)
+            if i is None:
+                continue
+            if labels[i] in slot:
+                duplicate_urls[slot[labels[i]]].append(url)
+                continue
+            slot[labels[i]] = len(members)
+            members.append(i)
+            duplicate_urls.append([])
+        companies.append((name, members, duplicate_urls))
+
+    # Inference jobs shared by all companies, so their articles share model batches
+    summaries, sentiments, topic_results = [], [], []
+    contents = [articles[label]['content'] for label in scored]
+    for start in range(0, len(contents), BULK_INFERENCE_BATCH):
+        with metrics.span("inference"):
+            batch_summaries, batch_sentiments, _ = await workers.run_inference(
+                utils.infer_shared, contents[start:start + BULK_INFERENCE_BATCH], (),
+                utils.summary_tier(mode))
+        summaries.extend(batch_summaries)
+        sentiments.extend(batch_sentiments)
+    metrics.count_articles("analyzed", len(scored))
+
+    # Topics per company, in jobs of about BULK_INFERENCE_BATCH articles
+    group, group_size = [], 0
+    for k, (_, members, _) in enumerate(companies):
+        group.append([articles[i]['content'] for i in members])
+        group_size += len(members)
+        if group_size >= BULK_INFERENCE_BATCH or k == len(companies) - 1:
+            with metrics.span("inference"):
+                topic_results.extend(await workers.run_inference(utils.extract_topics_corpora, group))
+            group, group_size = [], 0
+
+    async def finish(name, members, duplicate_urls, topic_result):
+        if not members:
+            return name, no_articles_result(name)
+        valid_articles = [
+            _article_record(articles[i], summaries[position[labels[i]]],
+                            sentiments[position[labels[i]]], topics, duplicates)
+            for i, topics, duplicates in zip(members, topic_result['topics'], duplicate_urls)
+        ]
+        result = await _finish_analysis(name, valid_articles, topic_result['common_topics'])
+        cache.analysis_cache.set(_result_key(name, mode), result)
+        return name, result
+
+    async def settle(name, members, duplicate_urls, topic_result):
+        try:
+            name, result = await finish(name, members, duplicate_urls, topic_result)
+        except Exception as e:
+            if not claims[name].done():
+                _fail_claim(claims[name], e)
+            raise
+        if not claims[name].done():
+            claims[name].set_result(result)
+        return name, result
+
+    tasks = [asyncio.ensure_future(_join_flight(*item)) for item in joined] + [
+        asyncio.ensure_future(settle(name, members, duplicate_urls, topic_result))
+        for (name, members, duplicate_urls), topic_result in zip(companies, topic_results)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # One company failing must not leave the others settling after their claims are failed
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def analyze_companies(company_names, mode=None):
+    """Bulk analysis under one admission slot; results follow the input order"""
+    async with workers.admission:
+        results = {name: result async for name, result in iter_company_analyses(company_names, mode)}
+    return [results[name] for name in dict.fromkeys(company_names) if name in results]
+
+async def stream_companies(company_names, mode=None):
+    """
+    Bulk analysis as an async generator of events: one "company" event with the
+    full result per company as soon as it completes, then "done".
+    """
+    completed = 0
+    async for name, result in iter_company_analyses(company_names, mode):
+        completed += 1
+        yield {"event": "company", **result}
+    yield {"event": "done", "companies": completed}
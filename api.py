@@ -1,8 +1,21 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+import analysis
+import cache
+import metrics
+import search
+import store
 import utils
+import watch
+import workers
+import json
 import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,95 +23,325 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Load models in the background as soon as the worker starts. With
+# WARMUP_ON_STARTUP=0 the first poll of /ready (or POST /warmup) starts the load.
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "1") == "1"
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+def start_background_warmup():
+    """Load the models on a background thread unless a load is already running"""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None or not _warmup_thread.is_alive():
+            _warmup_thread = threading.Thread(target=workers.warmup_inference, daemon=True)
+            _warmup_thread.start()
+
+@app.on_event("startup")
+def start_warmup():
+    if WARMUP_ON_STARTUP:
+        start_background_warmup()
+
+@app.on_event("startup")
+def start_watch():
+    # Resume watching when companies are configured or were added in an earlier run
+    if watch.WATCH_COMPANIES.strip() or os.path.exists(watch.WATCH_DB_PATH):
+        watch.get_watcher().start()
+
+@app.on_event("shutdown")
+def stop_workers():
+    watch.stop_watcher()
+    workers.shutdown()
+
 class CompanyRequest(BaseModel):
     company_name: str
+    # Add a per-stage "timings" breakdown of this request to the response
+    include_timings: bool = False
+    # Summarization mode: "fast", "balanced" or "quality" (default: SUMMARY_TIER)
+    mode: Optional[str] = None
+
+class CompaniesRequest(BaseModel):
+    company_names: List[str]
+    mode: Optional[str] = None
+
+def _check_mode(request):
+    if request.mode is not None and request.mode not in utils.SUMMARY_TIERS:
+        raise HTTPException(status_code=400,
+                            detail=f"mode must be one of: {', '.join(utils.SUMMARY_TIERS)}")
 
 @app.post("/analyze-company")
 async def analyze_company(request: CompanyRequest):
+    _check_mode(request)
     try:
-        # Search for news articles
-        articles = utils.search_news(request.company_name)
-        valid_articles = []
-        
-        # Process each article
-        for url in articles:
-            article = utils.extract_article_content(url)
-            if article and len(article['content']) > 100:  # Filter short content
-                try:
-                    # Process the article
-                    summary = utils.summarize_text(article['content'])
-                    sentiment = utils.analyze_sentiment(article['content'])
-                    topics = utils.extract_topics(article['content'])
-                    
-                    # Add to valid articles
-                    valid_articles.append({
-                        'title': article['title'],
-                        'url': article['url'],
-                        'summary': summary,
-                        'sentiment': sentiment,
-                        'topics': topics
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing {url}: {str(e)}")
-        
-        # Check if we have any valid articles
-        if not valid_articles:
-            return JSONResponse(content={
-                "message": "No valid articles found",
-                "fallback": True,
-                "articles": [],
-                "company": request.company_name
-            })
-        
-        # Perform comparative analysis
-        comparative_analysis = utils.perform_comparative_analysis(valid_articles)
-        
-        # Generate detailed summary text
-        sentiment_distribution = comparative_analysis["sentiment_distribution"]
-        common_topics = comparative_analysis["common_topics"]
-        
-        summary_text = f"Analysis for {request.company_name}:\n"
-        summary_text += f"A total of {comparative_analysis['total_articles']} articles were analyzed.\n"
-        
-        # Discuss sentiment distribution
-        summary_text += f"Sentiment distribution: "
-        summary_text += f"{sentiment_distribution.get('Positive', 0)} positive articles, "
-        summary_text += f"{sentiment_distribution.get('Negative', 0)} negative articles, and "
-        summary_text += f"{sentiment_distribution.get('Neutral', 0)} neutral articles.\n"
-        
-        # Discuss common topics
-        if common_topics:
-            topic_list = ', '.join([topic for topic, _ in common_topics[:5]])
-            summary_text += f"The most frequently discussed topics were: {topic_list}.\n"
-        
-        # Add overall sentiment score
-        avg_score = comparative_analysis["average_sentiment_score"]
-        summary_text += f"The average sentiment score across all articles was {avg_score:.2f}.\n"
-        
-        # Generate Hindi translation and speech
-        speech_file, hindi_text = utils.generate_hindi_speech(summary_text)
-        
-        result = {
-            "company": request.company_name,
-            "articles": valid_articles,
-            "comparative_analysis": comparative_analysis,
-            "summary_text": summary_text,
-            "hindi_text": hindi_text,
-            "speech_file": speech_file
-        }
-        
-        # Preprocess the result to remove any problematic float values
-        processed_result = utils.preprocess_data(result)
-        return JSONResponse(content=processed_result)
+        with metrics.collect_timings() as timings:
+            result = await analysis.cached_analysis(request.company_name, request.mode)
+        metrics.count_request("analyze", "ok")
+        if request.include_timings:
+            result = {**result, "timings": timings.as_dict()}
+        return JSONResponse(content=result)
     
+    except workers.Overloaded as e:
+        metrics.count_request("analyze", e.status_code)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
+        metrics.count_request("analyze", 500)
         logger.error(f"API Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze-company/stream")
+async def analyze_company_stream(request: CompanyRequest):
+    """
+    Streaming variant of /analyze-company as newline-delimited JSON events:
+    "search", one "article" per processed article, then "result".
+    """
+    _check_mode(request)
+    cached = await analysis.get_cached_analysis(request.company_name, request.mode)
+    if cached is not None:
+        metrics.count_request("stream", "ok")
+        events = _ndjson(_single_event({"event": "result", **cached}))
+        return StreamingResponse(events, media_type="application/x-ndjson")
+
+    # Reject before the response starts so overload still maps to 429
+    try:
+        await workers.admission.acquire()
+    except workers.Overloaded as e:
+        metrics.count_request("stream", e.status_code)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    metrics.count_request("stream", "ok")
+    events = _ndjson(analysis.stream_analysis(request.company_name, request.mode))
+    return AdmittedStreamingResponse(events, media_type="application/x-ndjson")
+
+def _check_bulk_request(request):
+    _check_mode(request)
+    if not request.company_names:
+        raise HTTPException(status_code=400, detail="company_names must not be empty")
+    if len(request.company_names) > analysis.BULK_MAX_COMPANIES:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {analysis.BULK_MAX_COMPANIES} companies per request")
+
+@app.post("/analyze-companies")
+async def analyze_companies(request: CompaniesRequest):
+    """
+    Analyze a list of companies in one request. Searches run concurrently, and
+    the fetch and model batches are shared, so articles found for several
+    companies are fetched and scored once. There is one result per distinct
+    company, in input order.
+    """
+    _check_bulk_request(request)
+    try:
+        results = await analysis.analyze_companies(request.company_names, request.mode)
+        metrics.count_request("bulk", "ok")
+        return JSONResponse(content={"results": results})
+
+    except workers.Overloaded as e:
+        metrics.count_request("bulk", e.status_code)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        metrics.count_request("bulk", 500)
+        logger.error(f"Bulk API Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze-companies/stream")
+async def analyze_companies_stream(request: CompaniesRequest):
+    """
+    Streaming variant of /analyze-companies as newline-delimited JSON events:
+    one "company" per company as soon as it completes, then "done".
+    """
+    _check_bulk_request(request)
+    try:
+        await workers.admission.acquire()
+    except workers.Overloaded as e:
+        metrics.count_request("bulk_stream", e.status_code)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    metrics.count_request("bulk_stream", "ok")
+    events = _ndjson(analysis.stream_companies(request.company_names, request.mode))
+    return AdmittedStreamingResponse(events, media_type="application/x-ndjson")
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response holding an admission slot, released once the response
+    ends: after the last event, on an error, or on a client disconnect before
+    the body iterator ever started
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            workers.admission.release()
+
+async def _single_event(event):
+    yield event
+
+async def _ndjson(events):
+    """Serialize events one per line, turning failures into a final error event"""
+    try:
+        async for event in events:
+            yield json.dumps(event) + "\n"
+    except Exception as e:
+        logger.error(f"Streaming API Error: {str(e)}")
+        status_code = e.status_code if isinstance(e, workers.Overloaded) else 500
+        yield json.dumps({"event": "error", "status_code": status_code, "detail": str(e)}) + "\n"
+
+@app.get("/audio/{audio_id}")
+async def get_audio(audio_id: str, request: Request):
+    """Serve synthesized speech from the audio cache, honouring single byte ranges"""
+    audio = utils.get_speech(audio_id)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio not found or expired")
+
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "public, max-age=86400"}
+    range_header = request.headers.get("range")
+    if not range_header:
+        return Response(content=audio, media_type="audio/mpeg", headers=headers)
+
+    byte_range = _parse_range(range_header, len(audio))
+    if byte_range is None:
+        headers["Content-Range"] = f"bytes */{len(audio)}"
+        return Response(status_code=416, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(audio)}"
+    return Response(content=audio[start:end + 1], status_code=206,
+                    media_type="audio/mpeg", headers=headers)
+
+def _parse_range(range_header, size):
+    """Parse a single 'bytes=start-end' range into inclusive offsets, or None if unsatisfiable"""
+    try:
+        unit, _, spec = range_header.partition("=")
+        if unit.strip() != "bytes" or "," in spec:
+            return None
+        start, _, end = spec.strip().partition("-")
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, end
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Company News Analyzer API"}
 
+@app.post("/warmup")
+def warmup():
+    """
+    Load all models and corpora now instead of on the first analysis; with
+    INFERENCE_EXECUTOR=process, in every inference worker
+    """
+    ready, status = workers.warmup_inference()
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "models": status})
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once every model is loaded where inference runs, 503
+    before that. A probe that finds the models unloaded starts loading them.
+    """
+    ready, status = workers.inference_status()
+    if not ready:
+        start_background_warmup()
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "models": status})
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the article, model and analysis caches"""
+    return cache.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage latencies, article counts, batch sizes, cache hit rates and queue depths"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/watch")
+async def watched_companies():
+    """Current rolling aggregates of every watched company"""
+    return {"companies": watch.get_watcher().all_aggregates()}
+
+@app.get("/watch/{company_name}")
+async def watched_company(company_name: str):
+    """Current rolling aggregates of one watched company; never runs the pipeline"""
+    aggregate = watch.get_watcher().aggregate(company_name)
+    if aggregate is None:
+        raise HTTPException(status_code=404, detail="Company is not watched")
+    return aggregate
+
+@app.post("/watch/{company_name}")
+async def watch_company(company_name: str):
+    """Add a company to the watch list and start its first incremental run"""
+    watcher = watch.get_watcher()
+    watcher.add(company_name)
+    watcher.schedule(company_name)
+    return JSONResponse(status_code=202, content=watcher.aggregate(company_name))
+
+@app.delete("/watch/{company_name}")
+async def unwatch_company(company_name: str):
+    """Stop watching a company and drop its index and aggregates"""
+    if not await watch.get_watcher().remove(company_name):
+        raise HTTPException(status_code=404, detail="Company is not watched")
+    return {"removed": company_name}
+
+def _parse_time(value, default):
+    """Epoch seconds or an ISO 8601 date/datetime (UTC unless an offset is given)"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    # fromisoformat only accepts a "Z" suffix from Python 3.11
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _history_range(start, end):
+    end = _parse_time(end, time.time())
+    start = _parse_time(start, end - 30 * 86400)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+@app.get("/history/{company_name}/sentiment")
+def sentiment_history(company_name: str, start: str = None, end: str = None, bucket: str = "day"):
+    """
+    Sentiment of the stored articles of a company per hour, day or week,
+    over [start, end) (default: the last 30 days). No model is run.
+    """
+    if bucket not in store.BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(store.BUCKETS)}")
+    start, end = _history_range(start, end)
+    started = time.perf_counter()
+    series = store.get_store().sentiment_series(analysis.company_key(company_name), start, end, bucket)
+    return {"company": company_name, "start": start, "end": end, "bucket": bucket, "series": series,
+            "query_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+@app.get("/history/{company_name}/topics")
+def topic_history(company_name: str, start: str = None, end: str = None, limit: int = 10):
+    """Most frequent topics of the stored articles of a company over [start, end)"""
+    start, end = _history_range(start, end)
+    started = time.perf_counter()
+    topics = store.get_store().top_topics(analysis.company_key(company_name), start, end,
+                                          max(1, min(limit, 100)))
+    return {"company": company_name, "start": start, "end": end, "topics": topics,
+            "query_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+@app.get("/search/stats")
+async def search_stats():
+    """Latency and error-rate statistics of each news search provider"""
+    return search.get_service().stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
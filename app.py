@@ -3,6 +3,10 @@ import requests
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import json
+import os
+
+API_BASE_URL = os.environ.get("API_BASE_URL", "http://127.0.0.1:8000")
 
 # Configure the Streamlit page
 st.set_page_config(page_title="News Sentiment Analyzer", layout="wide")
@@ -12,14 +16,67 @@ st.write("Enter a company name to analyze recent news sentiment and generate a H
 # Input field for the company name
 company_name = st.text_input("Company Name", "Tesla")
 
-if st.button("Analyze"):
-    with st.spinner("Analyzing news articles..."):
-        api_url = "http://127.0.0.1:8000/analyze-company"
-        response = requests.post(api_url, json={"company_name": company_name})
+def render_article(i, article):
+    """Render one analyzed article as an expander"""
+    with st.expander(f"{i+1}. {article.get('title', 'Untitled Article')}"):
+        st.write(f"**URL:** {article.get('url', 'No URL available')}")
+        st.write(f"**Summary:** {article.get('summary', 'No summary available')}")
+        
+        # Handle sentiment with nested dictionary access
+        sentiment = article.get('sentiment', {})
+        if isinstance(sentiment, dict):
+            sent_label = sentiment.get('sentiment', 'Unknown')
+            sent_score = sentiment.get('score', 0)
+            st.write(f"**Sentiment:** {sent_label} (Score: {sent_score:.2f})")
+        else:
+            st.write(f"**Sentiment:** {sentiment}")
         
-        if response.status_code == 200:
-            data = response.json()
+        st.write(f"**Topics:** {', '.join(article.get('topics', ['No topics identified']))}")
+
+def stream_analysis(company_name, status, articles_placeholder):
+    """
+    Consume the NDJSON stream from the API, rendering articles as they arrive.
+    Returns the final result payload, or None after showing an error.
+    """
+    api_url = API_BASE_URL + "/analyze-company/stream"
+    streamed_articles = []
+    with requests.post(api_url, json={"company_name": company_name}, stream=True) as response:
+        if response.status_code != 200:
+            st.error(f"Error: {response.text}")
+            return None
+        
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
             
+            if event["event"] == "search":
+                status.write(f"Found {len(event.get('urls', []))} candidate articles, processing...")
+            elif event["event"] == "article":
+                streamed_articles.append(event["article"])
+                status.write(f"Processed {len(streamed_articles)} articles...")
+                with articles_placeholder.container():
+                    st.write("## News Articles")
+                    for i, article in enumerate(streamed_articles):
+                        render_article(i, article)
+            elif event["event"] == "error":
+                st.error(f"Error: {event.get('detail')}")
+                return None
+            elif event["event"] == "result":
+                return event
+    return None
+
+if st.button("Analyze"):
+    status = st.empty()
+    results_container = st.container()
+    articles_placeholder = st.empty()
+    
+    with st.spinner("Analyzing news articles..."):
+        data = stream_analysis(company_name, status, articles_placeholder)
+    status.empty()
+    
+    if data is not None:
+        with results_container:
             # Check if we have valid results
             if data.get("fallback", False):
                 st.warning("No recent news articles found for this company.")
@@ -69,45 +126,31 @@ if st.button("Analyze"):
                     else:
                         st.write("Topic analysis unavailable")
             
-            # Display articles if available
-            if "articles" in data and len(data["articles"]) > 0:
-                st.write("## News Articles")
-                for i, article in enumerate(data["articles"]):
-                    with st.expander(f"{i+1}. {article.get('title', 'Untitled Article')}"):
-                        st.write(f"**URL:** {article.get('url', 'No URL available')}")
-                        st.write(f"**Summary:** {article.get('summary', 'No summary available')}")
-                        
-                        # Handle sentiment with nested dictionary access
-                        sentiment = article.get('sentiment', {})
-                        if isinstance(sentiment, dict):
-                            sent_label = sentiment.get('sentiment', 'Unknown')
-                            sent_score = sentiment.get('score', 0)
-                            st.write(f"**Sentiment:** {sent_label} (Score: {sent_score:.2f})")
-                        else:
-                            st.write(f"**Sentiment:** {sentiment}")
-                        
-                        st.write(f"**Topics:** {', '.join(article.get('topics', ['No topics identified']))}")
-            else:
-                st.write("## No Articles Found")
-                st.info("Could not retrieve any news articles for analysis")
+            # Display articles with their final topics, replacing the streamed ones
+            with articles_placeholder.container():
+                if "articles" in data and len(data["articles"]) > 0:
+                    st.write("## News Articles")
+                    for i, article in enumerate(data["articles"]):
+                        render_article(i, article)
+                else:
+                    st.write("## No Articles Found")
+                    st.info("Could not retrieve any news articles for analysis")
             
             # Display Hindi summary if available
             if "hindi_text" in data and data["hindi_text"]:
                 st.write("## Hindi Summary")
                 st.write(data["hindi_text"])
                 
-                if "speech_file" in data and data["speech_file"]:
+                if data.get("audio_url"):
+                    # Fetch the audio here: the API is not reachable from the user's browser
                     try:
-                        with open(data["speech_file"], "rb") as audio_file:
-                            audio_bytes = audio_file.read()
-                            st.audio(audio_bytes, format="audio/mp3")
-                    except FileNotFoundError:
+                        audio_response = requests.get(API_BASE_URL + data["audio_url"], timeout=30)
+                        audio_response.raise_for_status()
+                        st.audio(audio_response.content, format="audio/mp3")
+                    except requests.RequestException:
                         st.error("Audio file not found")
                 else:
                     st.warning("Hindi audio summary is unavailable")
             else:
                 st.write("## Summary Unavailable")
                 st.warning("Could not generate Hindi summary")
-            
-        else:
-            st.error(f"Error: {response.text}")
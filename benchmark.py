@@ -0,0 +1,265 @@
+"""
+Offline benchmark of the end-to-end analysis pipeline.
+
+    python benchmark.py --concurrency 1,4,8 --requests 8 --output bench.json
+
+Article pages are served from the recorded HTML in fixtures/html by a local HTTP
+server. Search, translation and speech use their stub backends, so nothing leaves
+the machine. --models tiny swaps in small checkpoints for quick runs; the default
+uses the configured models (set MODEL_CACHE_DIR to load them locally).
+
+For every concurrency level the report holds throughput and request latency
+percentiles, per-stage latency percentiles and the time spent in the models.
+It also holds peak RSS, model load times, the commit and the settings used,
+written as JSON so runs can be compared between commits.
+
+All fixture pages share one host, so FETCH_PER_HOST bounds fetch concurrency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+HTML_FIXTURES_DIR = os.path.join(ROOT_DIR, "fixtures", "html")
+
+COMPANIES = ("Acme Motors", "Globex Bank", "Initech", "Umbrella Pharma")
+
+# Small checkpoints with the same architecture as the defaults
+TINY_MODELS = {
+    "SENTIMENT_MODEL": "sshleifer/tiny-distilbert-base-uncased-finetuned-sst-2-english",
+    "SUMMARIZATION_MODEL": "sshleifer/bart-tiny-random"
+}
+
+# Pipeline stages reported, in order (see the metrics.span calls)
+STAGES = ("analysis", "search", "fetch", "dedup", "inference", "summarize", "sentiment",
+          "topics", "speech", "translate", "tts")
+# Stages whose time counts as model time
+MODEL_STAGES = ("summarize", "sentiment")
+
+
+class _FixtureHandler(SimpleHTTPRequestHandler):
+    """Serves fixture pages after an optional per-response latency"""
+
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(directory=HTML_FIXTURES_DIR, latency=0.0):
+    """Serve directory on a free localhost port; returns (server, base_url)"""
+    handler = type("FixtureHandler", (_FixtureHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def fixture_urls(base_url, directory=HTML_FIXTURES_DIR):
+    return [f"{base_url}/{name}" for name in sorted(os.listdir(directory)) if name.endswith(".html")]
+
+def latency_summary(samples):
+    """Count, mean and percentiles in milliseconds"""
+    import numpy as np
+
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p90_ms": round(float(np.percentile(values, 90)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2)
+    }
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def configure_environment(args):
+    """
+    Settings for an offline run; must be applied before the pipeline modules
+    are imported, since they read their configuration at import time.
+    """
+    env = {
+        "SEARCH_PROVIDERS": "",
+        "TRANSLATION_BACKEND": "stub",
+        "TTS_BACKEND": "stub",
+        "TTS_STUB_DELAY": str(args.tts_delay),
+        "CACHE_BACKEND": "memory",
+        "ARTICLE_STORE_PATH": ":memory:",
+        "INFERENCE_EXECUTOR": "thread"
+    }
+    if args.mode:
+        env["SUMMARY_TIER"] = args.mode
+    if args.models == "tiny":
+        env.update(TINY_MODELS)
+    if not args.warm_cache:
+        # Zero-sized caches so every request does the full work
+        for name in ("ARTICLE", "MODEL", "ANALYSIS", "TRANSLATION", "AUDIO"):
+            env[f"{name}_CACHE_SIZE"] = "0"
+    os.environ.update(env)
+    return env
+
+async def run_level(analyze_company, concurrency, requests):
+    """
+    Run requests analyses with at most concurrency in flight. Returns the wall
+    time, request latencies, per-request stage totals and per-article timings
+    (in seconds), articles per request and failures.
+    """
+    import metrics
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, articles, failures = [], [], []
+    stages, article_stages = defaultdict(list), defaultdict(list)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                with metrics.collect_timings() as timings:
+                    result = await analyze_company(COMPANIES[i % len(COMPANIES)])
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {str(e)}")
+                return
+            latencies.append(time.perf_counter() - started)
+            for stage, (seconds, _) in timings.stages.items():
+                stages[stage].append(seconds)
+            for article in timings.articles:
+                article_stages["fetch"].append(article["fetch_ms"] / 1000)
+                article_stages["extract"].append(article["extract_ms"] / 1000)
+            if result.get("fallback"):
+                failures.append("no articles")
+            articles.append(len(result.get("articles", [])))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - started, latencies, stages, article_stages, articles, failures
+
+def run_benchmark(args):
+    settings = configure_environment(args)
+
+    import analysis
+    import models
+    import search
+    import translation
+    import utils
+    import workers
+
+    server, base_url = start_fixture_server(latency=args.page_latency)
+    urls = fixture_urls(base_url)
+    search.set_providers([search.StubProvider(urls, delay=args.search_delay)])
+    translation.set_backend(translation.StubBackend(delay=args.translation_delay))
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            **settings,
+            "models": args.models,
+            "inference_backend": models.INFERENCE_BACKEND,
+            "summary_tier": utils.SUMMARY_TIER,
+            "sentiment_model": models.SENTIMENT_MODEL,
+            "summarization_model": models.SUMMARIZATION_MODEL,
+            "warm_cache": args.warm_cache,
+            "fixture_pages": len(urls),
+            "page_latency": args.page_latency,
+            "search_delay": args.search_delay,
+            "translation_delay": args.translation_delay
+        },
+        "levels": []
+    }
+
+    try:
+        report["models"] = models.registry.warmup()
+        report["rss_after_load_mb"] = peak_rss_mb()
+
+        # Untimed requests so first-call costs are not measured
+        for _ in range(args.warmup_requests):
+            asyncio.run(run_level(analysis.analyze_company, 1, 1))
+
+        for concurrency in args.concurrency:
+            wall, latencies, stages, article_stages, articles, failures = asyncio.run(
+                run_level(analysis.analyze_company, concurrency, args.requests))
+            model_seconds = sum(sum(stages[stage]) for stage in MODEL_STAGES)
+            report["levels"].append({
+                "concurrency": concurrency,
+                "requests": args.requests,
+                "failures": len(failures),
+                "errors": sorted(set(failures)),
+                "wall_seconds": round(wall, 3),
+                "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+                "articles_per_request": round(sum(articles) / len(articles), 2) if articles else 0,
+                "latency": latency_summary(latencies),
+                "stages": {stage: latency_summary(stages[stage]) for stage in STAGES},
+                "articles": {stage: latency_summary(samples)
+                             for stage, samples in article_stages.items()},
+                "model_seconds": round(model_seconds, 3),
+                "model_share": round(model_seconds / sum(latencies), 3) if latencies else None,
+                "peak_rss_mb": peak_rss_mb()
+            })
+    finally:
+        server.shutdown()
+        workers.shutdown()
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4",
+                        help="comma-separated numbers of concurrent requests (default 1,4)")
+    parser.add_argument("--requests", type=int, default=8, help="requests per concurrency level")
+    parser.add_argument("--models", choices=("real", "tiny"), default="real",
+                        help="configured checkpoints or tiny ones")
+    parser.add_argument("--mode", choices=("fast", "balanced", "quality"),
+                        help="summarization tier (default SUMMARY_TIER)")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="keep the article, model and translation caches enabled")
+    parser.add_argument("--warmup-requests", type=int, default=1)
+    parser.add_argument("--page-latency", type=float, default=0.0,
+                        help="seconds the fixture server waits per page")
+    parser.add_argument("--search-delay", type=float, default=0.0)
+    parser.add_argument("--translation-delay", type=float, default=0.0)
+    parser.add_argument("--tts-delay", type=float, default=0.0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    args.concurrency = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    report = run_benchmark(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Result caches for the analysis pipeline.
+
+Three layers, each a size-bounded LRU with its own TTL:
+
+- article_cache: extracted article content, keyed by URL
+- model_cache: model outputs, keyed by model, settings and content hash
+- analysis_cache: final company analyses, keyed by normalized company name and summarization mode
+
+plus translation_cache, holding translated sentences (see translation.py), and
+audio_cache, holding synthesized speech bytes keyed by a hash of text and language.
+
+Caches live in process memory. With CACHE_BACKEND=sqlite entries are also
+written through to CACHE_PATH so they survive restarts and are shared between
+worker processes.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_PATH = os.environ.get("CACHE_PATH", "cache.sqlite3")
+
+
+class SQLiteBackend:
+    """Pickled key/value rows in one SQLite table per cache, LRU-trimmed to maxsize"""
+
+    def __init__(self, path, table, maxsize):
+        self.path = path
+        self.table = table
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        # Connections inherited through fork; kept referenced so the child never closes them
+        self._inherited = []
+
+    @property
+    def conn(self):
+        """
+        Connection owned by the current process. It is opened on first use and
+        re-opened after a fork, since SQLite connections must not cross processes.
+        Call with self._lock held.
+        """
+        if self._conn is None or self._pid != os.getpid():
+            if self._conn is not None:
+                self._inherited.append(self._conn)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)")
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            self.conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), expires_at, time.time()))
+            self.conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute(f"DELETE FROM {self.table}")
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ttl seconds after being stored"""
+
+    def __init__(self, name, maxsize, ttl, backend=None, max_bytes=None, sizeof=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        # Optional bound on the summed sizeof(value) of all entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(key)
+
+        if self.backend is not None:
+            try:
+                stored = self.backend.get(key)
+            except Exception as e:
+                logger.error(f"Cache backend read failed for {self.name}: {str(e)}")
+                stored = None
+            if stored is not None:
+                value, expires_at = stored
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, value, expires_at)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at)
+            except Exception as e:
+                logger.error(f"Cache backend write failed for {self.name}: {str(e)}")
+
+    def _store(self, key, value, expires_at):
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (expires_at, value)
+        self.bytes += self.sizeof(value)
+        while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.bytes > self.max_bytes and len(self._data) > 1):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, value = self._data.pop(key)
+        self.bytes -= self.sizeof(value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+        }
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls for the same key into one computation"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.coalesced = 0
+
+    async def run(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so one cancelled caller does not cancel the shared computation
+        return await asyncio.shield(task)
+
+    def pending(self, key):
+        """The in-flight computation for key, or None"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        return task
+
+    def claim(self, key):
+        """
+        Register a computation for key that the caller completes through the
+        returned future; run() calls for key wait on it meanwhile.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        def done(_):
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.add_done_callback(done)
+        return future
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def model_key(model_name, settings, text):
+    """Cache key for a model output: model id, settings that change the output, content hash"""
+    return f"{model_name}|{settings}|{content_hash(text)}"
+
+def _make_cache(name, default_size, default_ttl, persistent=True, **kwargs):
+    maxsize = int(os.environ.get(f"{name.upper()}_CACHE_SIZE", default_size))
+    ttl = float(os.environ.get(f"{name.upper()}_CACHE_TTL", default_ttl))
+    backend = None
+    if persistent and CACHE_BACKEND == "sqlite":
+        try:
+            backend = SQLiteBackend(CACHE_PATH, f"{name}_cache", maxsize)
+        except Exception as e:
+            logger.error(f"Could not open cache database {CACHE_PATH}: {str(e)}")
+    return TTLCache(name, maxsize, ttl, backend, **kwargs)
+
+
+article_cache = _make_cache("article", 2048, 6 * 3600)
+model_cache = _make_cache("model", 8192, 7 * 24 * 3600)
+analysis_cache = _make_cache("analysis", 256, 15 * 60)
+translation_cache = _make_cache("translation", 8192, 30 * 24 * 3600)
+# Synthesized speech stays in memory only, bounded by total audio bytes
+audio_cache = _make_cache("audio", 512, 24 * 3600, persistent=False,
+                          max_bytes=int(os.environ.get("AUDIO_CACHE_BYTES", 64 * 1024 * 1024)),
+                          sizeof=len)
+analysis_flight = SingleFlight()
+
+def stats():
+    """Hit/miss counters for every cache layer"""
+    return {
+        "article": article_cache.stats(),
+        "model": model_cache.stats(),
+        "analysis": analysis_cache.stats(),
+        "translation": translation_cache.stats(),
+        "audio": audio_cache.stats(),
+        "coalesced_requests": analysis_flight.coalesced
+    }
@@ -0,0 +1,163 @@
+"""
+Near-duplicate detection for syndicated articles.
+
+Each article is reduced to a MinHash signature over hashed word shingles. All
+signatures are computed at once as a NumPy matrix. LSH banding proposes candidate
+pairs, whose estimated Jaccard similarity is then checked against
+DEDUP_THRESHOLD. Connected pairs form clusters; the models run once per cluster.
+"""
+import logging
+import os
+import re
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 0.8))
+DEDUP_NUM_PERM = int(os.environ.get("DEDUP_NUM_PERM", 128))
+DEDUP_BANDS = int(os.environ.get("DEDUP_BANDS", 32))
+DEDUP_SHINGLE_SIZE = int(os.environ.get("DEDUP_SHINGLE_SIZE", 5))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_PATTERN = re.compile(r"\w+")
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "1") == "1"
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=DEDUP_NUM_PERM, dtype=np.uint64)
+
+
+def _shingle_hashes(text, size):
+    """32-bit hashes of the distinct word n-grams of a text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+def minhash_signatures(texts, num_perm=None, shingle_size=None):
+    """MinHash signature matrix of shape (len(texts), num_perm)"""
+    num_perm = num_perm or DEDUP_NUM_PERM
+    shingle_size = shingle_size or DEDUP_SHINGLE_SIZE
+    a, b = _PERM_A[:num_perm], _PERM_B[:num_perm]
+    signatures = np.full((len(texts), num_perm), _MAX_HASH, dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashes = _shingle_hashes(text, shingle_size)
+        if len(hashes):
+            # Universal hashing of every shingle under every permutation at once
+            permuted = (np.outer(hashes, a) + b) % _MERSENNE_PRIME & _MAX_HASH
+            signatures[i] = permuted.min(axis=0)
+    return signatures
+
+def _candidate_pairs(signatures, bands):
+    """Pairs of rows sharing at least one identical LSH band"""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = set()
+    for band in range(bands):
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        _, bucket = np.unique(chunk, axis=0, return_inverse=True)
+        bucket = bucket.ravel()
+        order = np.argsort(bucket, kind="stable")
+        # Runs of rows in the same bucket are candidate groups
+        boundaries = np.flatnonzero(np.diff(bucket[order])) + 1
+        for group in np.split(order, boundaries):
+            if len(group) > 1:
+                for j in range(1, len(group)):
+                    pairs.add((int(group[0]), int(group[j])))
+    return pairs
+
+def cluster_near_duplicates(texts, threshold=None, num_perm=None, bands=None):
+    """
+    Group texts whose estimated Jaccard similarity reaches threshold.
+    Returns a cluster label per text; each label is the index of the cluster's
+    first text, so singletons label themselves.
+    """
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    bands = bands or DEDUP_BANDS
+    n = len(texts)
+    parents = list(range(n))
+    if n < 2:
+        return parents
+
+    signatures = minhash_signatures(texts, num_perm)
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    pairs = _candidate_pairs(signatures, min(bands, signatures.shape[1]))
+    if pairs:
+        left, right = np.array(sorted(pairs)).T
+        similarity = (signatures[left] == signatures[right]).mean(axis=1)
+        for i, j in zip(left[similarity >= threshold], right[similarity >= threshold]):
+            root_i, root_j = find(int(i)), find(int(j))
+            if root_i != root_j:
+                parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    return [find(i) for i in range(n)]
+
+def deduplicate(articles, threshold=None):
+    """
+    Collapse near-duplicate articles into one representative per cluster.
+    Returns (representatives, duplicate_urls) where duplicate_urls[k] lists the
+    other URLs in the cluster of representatives[k]. The first article of each
+    cluster (in input order) is kept.
+    """
+    if len(articles) < 2:
+        return list(articles), [[] for _ in articles]
+    labels = cluster_near_duplicates([article['content'] for article in articles], threshold)
+    representatives, duplicate_urls, position = [], [], {}
+    for i, label in enumerate(labels):
+        if label == i:
+            position[i] = len(representatives)
+            representatives.append(articles[i])
+            duplicate_urls.append([])
+        else:
+            duplicate_urls[position[label]].append(articles[i]['url'])
+    removed = len(articles) - len(representatives)
+    if removed:
+        logger.info(f"Collapsed {removed} near-duplicate article(s) into {len(representatives)} cluster(s)")
+    return representatives, duplicate_urls
+
+def match_new_articles(new_articles, seen_signatures=(), threshold=None):
+    """
+    Incremental variant of deduplicate for streamed batches. Only the new
+    articles are hashed; seen_signatures holds the signature rows of the articles
+    already kept, in order.
+    Returns (matches, signatures): one match per new article, None if it starts a
+    new cluster, otherwise the index of the article it duplicates in the kept
+    articles + new_articles; and the signature matrix of the new articles.
+    """
+    signatures = minhash_signatures([article['content'] for article in new_articles])
+    seen_signatures = np.asarray(seen_signatures, dtype=np.uint64).reshape(-1, signatures.shape[1])
+    offset = len(seen_signatures)
+    matches = []
+    for match in match_signatures(signatures, seen_signatures, threshold):
+        # A match on a duplicate in the same batch resolves to that duplicate's cluster
+        if match is not None and match >= offset and matches[match - offset] is not None:
+            match = matches[match - offset]
+        matches.append(match)
+    return matches, signatures
+
+def match_signatures(signatures, seen_signatures, threshold=None):
+    """
+    Match new MinHash signatures against stored ones by direct comparison.
+    Returns one entry per new row: None if it duplicates nothing, otherwise the
+    index of the first row it duplicates in seen_signatures + signatures.
+    """
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    combined = np.vstack([seen_signatures, signatures])
+    offset = len(seen_signatures)
+    matches = []
+    for i in range(len(signatures)):
+        similarity = (combined[:offset + i] == signatures[i]).mean(axis=1)
+        found = np.flatnonzero(similarity >= threshold)
+        matches.append(int(found[0]) if len(found) else None)
+    return matches
@@ -0,0 +1,211 @@
+"""
+Offline quality checks on the fixture articles in fixtures/.
+
+    python evaluation.py backends --backend quantized
+
+runs the sentiment and summarization models on the fixture set with the fp32
+torch backend and with the candidate backend. It reports label agreement, score
+error, ROUGE agreement of the summaries and the speedup, so a faster backend can
+be picked knowing what accuracy it costs.
+
+    python evaluation.py summary-modes
+
+summarizes the fixture set in each summarization tier (fast, balanced,
+quality) and reports the time taken, how many articles went to the
+abstractive model and ROUGE agreement with the quality output, to choose
+SUMMARY_TIER and the balanced routing thresholds.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def load_fixture_articles(path=None):
+    """Fixture articles as a list of {'title', 'content'} dicts"""
+    with open(path or os.path.join(FIXTURES_DIR, "articles.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def _tokens(text):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def _f1(overlap, reference_total, candidate_total):
+    if not overlap or not reference_total or not candidate_total:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+def rouge_n(reference, candidate, n=1):
+    """ROUGE-N F1 between two texts"""
+    def ngrams(tokens):
+        return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    reference_counts = ngrams(_tokens(reference))
+    candidate_counts = ngrams(_tokens(candidate))
+    overlap = sum((reference_counts & candidate_counts).values())
+    return _f1(overlap, sum(reference_counts.values()), sum(candidate_counts.values()))
+
+def rouge_l(reference, candidate):
+    """ROUGE-L F1 (longest common subsequence) between two texts"""
+    reference_tokens, candidate_tokens = _tokens(reference), _tokens(candidate)
+    previous = [0] * (len(candidate_tokens) + 1)
+    for token in reference_tokens:
+        current = [0]
+        for j, other in enumerate(candidate_tokens):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    return _f1(previous[-1], len(reference_tokens), len(candidate_tokens))
+
+def rouge_scores(references, candidates):
+    """Mean ROUGE-1, ROUGE-2 and ROUGE-L F1 over aligned lists of texts"""
+    pairs = list(zip(references, candidates))
+    if not pairs:
+        return {"rouge1": 0.0, "rouge2": 0.0, "rougeL": 0.0}
+    return {
+        "rouge1": round(sum(rouge_n(r, c, 1) for r, c in pairs) / len(pairs), 4),
+        "rouge2": round(sum(rouge_n(r, c, 2) for r, c in pairs) / len(pairs), 4),
+        "rougeL": round(sum(rouge_l(r, c) for r, c in pairs) / len(pairs), 4)
+    }
+
+def _run_sentiment(nlp, texts):
+    started = time.perf_counter()
+    outputs = [nlp(text[:512])[0] for text in texts]
+    return outputs, time.perf_counter() - started
+
+def _run_summarization(nlp, texts):
+    import utils
+
+    started = time.perf_counter()
+    outputs = []
+    for text in texts:
+        dynamic_max = utils._summary_length(text, 150)
+        outputs.append(nlp(text[:1024], max_length=dynamic_max,
+                           min_length=int(dynamic_max * 0.5), do_sample=False)[0]['summary_text'])
+    return outputs, time.perf_counter() - started
+
+def compare_backends(candidate_backend, baseline_backend="torch", articles=None):
+    """
+    Run both models on the fixture set with the baseline and the candidate
+    backend and report agreement and speed. Each pipeline is run once on the
+    first text before timing so load-time work is not counted.
+    """
+    import models
+
+    articles = articles or load_fixture_articles()
+    texts = [article['content'] for article in articles]
+    report = {"baseline": baseline_backend, "candidate": candidate_backend, "articles": len(texts)}
+
+    outputs = {}
+    for backend in (baseline_backend, candidate_backend):
+        nlp = models.build_pipeline("sentiment-analysis", models.SENTIMENT_MODEL, backend)
+        _run_sentiment(nlp, texts[:1])
+        outputs[("sentiment", backend)] = _run_sentiment(nlp, texts)
+        nlp = models.build_pipeline("summarization", models.SUMMARIZATION_MODEL, backend)
+        _run_summarization(nlp, texts[:1])
+        outputs[("summarization", backend)] = _run_summarization(nlp, texts)
+
+    baseline, baseline_seconds = outputs[("sentiment", baseline_backend)]
+    candidate, candidate_seconds = outputs[("sentiment", candidate_backend)]
+    report["sentiment"] = {
+        "model": models.SENTIMENT_MODEL,
+        "label_agreement": round(sum(b['label'] == c['label'] for b, c in zip(baseline, candidate)) / len(texts), 4),
+        "score_mae": round(sum(abs(b['score'] - c['score']) for b, c in zip(baseline, candidate)) / len(texts), 4),
+        "baseline_seconds": round(baseline_seconds, 3),
+        "candidate_seconds": round(candidate_seconds, 3),
+        "speedup": round(baseline_seconds / candidate_seconds, 2) if candidate_seconds else None
+    }
+
+    baseline, baseline_seconds = outputs[("summarization", baseline_backend)]
+    candidate, candidate_seconds = outputs[("summarization", candidate_backend)]
+    report["summarization"] = {
+        "model": models.SUMMARIZATION_MODEL,
+        **rouge_scores(baseline, candidate),
+        "exact_match": round(sum(b == c for b, c in zip(baseline, candidate)) / len(texts), 4),
+        "baseline_seconds": round(baseline_seconds, 3),
+        "candidate_seconds": round(candidate_seconds, 3),
+        "speedup": round(baseline_seconds / candidate_seconds, 2) if candidate_seconds else None
+    }
+    return report
+
+def compare_summary_modes(articles=None, modes=("fast", "balanced", "quality")):
+    """
+    Summarize the fixture set in each tier, bypassing the model cache, and
+    report the time and ROUGE agreement with the "quality" summaries. The
+    summarizer and the extractive path are run once on the first text before
+    timing.
+    """
+    import models
+    import utils
+
+    articles = articles or load_fixture_articles()
+    texts = [article['content'] for article in articles]
+
+    def abstractive(batch):
+        return utils.summarize_batch(batch), None
+
+    utils.summarize_batch(texts[:1])
+    utils.extractive_summarize_batch(texts[:1])
+    outputs = {}
+    for mode in dict.fromkeys(modes + ("quality",)):
+        started = time.perf_counter()
+        summaries, stats = utils.summarize_tiered(texts, mode, abstractive)
+        outputs[mode] = (summaries, stats, time.perf_counter() - started)
+
+    reference, _, reference_seconds = outputs["quality"]
+    report = {
+        "model": models.SUMMARIZATION_MODEL,
+        "articles": len(texts),
+        "route_min_words": utils.SUMMARY_ROUTE_MIN_WORDS,
+        "route_top_k": utils.SUMMARY_ROUTE_TOP_K,
+        "modes": {}
+    }
+    for mode in modes:
+        summaries, stats, seconds = outputs[mode]
+        report["modes"][mode] = {
+            "abstractive": (stats or {}).get("abstractive", len(texts)),
+            "extractive": (stats or {}).get("extractive", 0),
+            "seconds": round(seconds, 3),
+            "ms_per_article": round(seconds * 1000 / len(texts), 2),
+            "speedup": round(reference_seconds / seconds, 2) if seconds else None,
+            **rouge_scores(reference, summaries)
+        }
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backends = commands.add_parser("backends", help="compare an inference backend against fp32")
+    backends.add_argument("--backend", default="quantized", help="candidate backend (quantized, onnx)")
+    backends.add_argument("--baseline", default="torch", help="reference backend")
+    backends.add_argument("--fixtures", help="path to a fixture articles JSON file")
+    backends.add_argument("--output", help="write the JSON report to this file")
+
+    summary_modes = commands.add_parser("summary-modes",
+                                        help="compare the summarization tiers against the abstractive model")
+    summary_modes.add_argument("--fixtures", help="path to a fixture articles JSON file")
+    summary_modes.add_argument("--output", help="write the JSON report to this file")
+
+    args = parser.parse_args(argv)
+    articles = load_fixture_articles(args.fixtures) if args.fixtures else None
+    if args.command == "backends":
+        report = compare_backends(args.backend, args.baseline, articles)
+    elif args.command == "summary-modes":
+        report = compare_summary_modes(articles)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
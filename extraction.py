@@ -0,0 +1,154 @@
+"""
+Article extraction engine.
+
+Responses are streamed and capped at EXTRACTION_MAX_BYTES, and non-HTML content
+types are rejected before the body is read. Pages are parsed once with lxml's
+C parser. The article, main, .article-body and body strategies are then all
+evaluated in a single walk over the paragraph and heading elements.
+
+Set EXTRACTION_WORKERS to parse in a process pool instead of the fetching thread.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MAX_BYTES = int(os.environ.get("EXTRACTION_MAX_BYTES", 2 * 1024 * 1024))
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", 0))
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_TAGS = ("p", "h1", "h2", "h3")
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.5',
+    'Accept-Language': 'en-US,en;q=0.5'
+}
+
+# Strategies in order of preference; the first with substantial content wins
+STRATEGIES = ("article", "main", "article-body", "body")
+MIN_CONTENT_LENGTH = 500
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+class NotHTMLError(Exception):
+    """Raised when a URL does not serve an HTML document"""
+
+
+def fetch_html(session, url, timeout, max_bytes=None):
+    """
+    Stream a page body, stopping at max_bytes.
+    Returns (body, encoding, fetch_ms); raises NotHTMLError for other content types.
+    """
+    max_bytes = max_bytes or EXTRACTION_MAX_BYTES
+    started = time.perf_counter()
+    with session.get(url, headers=HEADERS, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            raise NotHTMLError(f"unsupported content type {content_type}")
+
+        chunks, size = [], 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                logger.info(f"Truncated {url} at {max_bytes} bytes")
+                break
+        encoding = response.encoding if "charset" in response.headers.get("Content-Type", "") else None
+    body = b"".join(chunks)[:max_bytes]
+    return body, encoding, (time.perf_counter() - started) * 1000
+
+def _candidate_roots(tree, body):
+    """The first element matching each strategy, keyed by strategy name"""
+    roots = {}
+    for name, xpath in (("article", "//article"), ("main", "//main"),
+                        ("article-body", "//*[contains(concat(' ', normalize-space(@class), ' '), ' article-body ')]")):
+        found = tree.xpath(xpath)
+        if found:
+            roots[name] = found[0]
+    roots["body"] = body
+    return roots
+
+def parse_article(body, url, encoding=None):
+    """
+    Parse HTML bytes into the article dict (title, content, url) plus byte count
+    and extraction time. Top-level so it can run in a process pool.
+    """
+    import lxml.html
+
+    started = time.perf_counter()
+    parser = lxml.html.HTMLParser(encoding=encoding) if encoding else None
+    tree = lxml.html.document_fromstring(body, parser=parser)
+
+    title_element = tree.find(".//title")
+    title = title_element.text_content().strip() if title_element is not None else ""
+    body_element = tree.body if tree.find("body") is not None else tree
+
+    # One pass over all text elements, attributing each to every strategy root containing it
+    roots = _candidate_roots(tree, body_element)
+    # Several strategies can resolve to the same element, so map each to all of its names
+    root_names = {}
+    for name, element in roots.items():
+        root_names.setdefault(id(element), []).append(name)
+    texts = {name: [] for name in roots}
+    for element in body_element.iter(*TEXT_TAGS):
+        text = element.text_content().strip()
+        if not text:
+            continue
+        ancestor = element
+        while ancestor is not None:
+            for name in root_names.get(id(ancestor), ()):
+                texts[name].append(text)
+            ancestor = ancestor.getparent()
+
+    content = ""
+    for name in STRATEGIES:
+        if name in texts:
+            candidate = ' '.join(texts[name])
+            if len(candidate) > MIN_CONTENT_LENGTH:
+                content = candidate
+                break
+            content = content or candidate
+
+    return {
+        'title': title or "No title",
+        'content': content,
+        'url': url,
+        'bytes': len(body),
+        'extract_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def get_parse_pool():
+    """Process pool for parsing, or None when EXTRACTION_WORKERS is 0"""
+    global _parse_pool
+    if EXTRACTION_WORKERS <= 0:
+        return None
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                # First created from a fetch thread while others run, so never fork
+                _parse_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+def extract_article(session, url, timeout=15, max_bytes=None):
+    """Fetch and extract one article, returning None on any failure"""
+    try:
+        body, encoding, fetch_ms = fetch_html(session, url, timeout, max_bytes)
+        pool = get_parse_pool()
+        if pool is not None:
+            article = pool.submit(parse_article, body, url, encoding).result(timeout=timeout)
+        else:
+            article = parse_article(body, url, encoding)
+        article['fetch_ms'] = round(fetch_ms, 2)
+        article['fetched_at'] = time.time()
+        return article
+    except Exception as e:
+        logger.error(f"Failed to extract content from {url}: {str(e)}")
+        return None
@@ -0,0 +1,232 @@
+"""
+Timing spans and Prometheus metrics for the analysis pipeline.
+
+Wrap a stage in `with metrics.span("summarize"):` to record its duration in the
+stage latency histogram and, inside collect_timings(), in the per-request timings
+block. render() produces the /metrics text exposition, with cache hit rates and
+queue depths read at scrape time.
+
+With METRICS_ENABLED=0 and no timings requested, span() returns a shared no-op
+context manager, so instrumented code only pays for a context variable lookup.
+Spans are recorded in the process that runs them; with INFERENCE_EXECUTOR=process
+the model stages show up only as the parent's "inference" span.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_PREFIX = "newsanalysis"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+_NOOP = nullcontext()
+_timings = contextvars.ContextVar("timings", default=None)
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution with optional labels"""
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # Per label set: [per-bucket counts (last is +Inf), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    le = f'le="{_number(bound) if bound != "+Inf" else bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Timings:
+    """Per-request breakdown filled in by the spans run on its behalf"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.articles = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def add_article(self, url, fetch_ms, extract_ms):
+        with self._lock:
+            self.articles.append({"url": url, "fetch_ms": fetch_ms, "extract_ms": extract_ms})
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "stages": {stage: {"ms": round(total * 1000, 2), "count": count}
+                           for stage, (total, count) in self.stages.items()},
+                "articles": list(self.articles)
+            }
+
+
+stage_seconds = Histogram("stage_seconds", "Duration of each pipeline stage in seconds",
+                          LATENCY_BUCKETS, ("stage",))
+model_batch_size = Histogram("model_batch_size", "Inputs per model call",
+                             BATCH_BUCKETS, ("model",))
+articles_total = Counter("articles_total", "Articles seen by the pipeline, by outcome", ("outcome",))
+requests_total = Counter("requests_total", "Analysis requests, by endpoint and status",
+                         ("endpoint", "status"))
+
+
+class _Span:
+    __slots__ = ("stage", "timings", "started")
+
+    def __init__(self, stage, timings):
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self.started, self.timings)
+        return False
+
+
+def span(stage):
+    """Context manager timing one stage"""
+    timings = _timings.get()
+    if not METRICS_ENABLED and timings is None:
+        return _NOOP
+    return _Span(stage, timings)
+
+def record(stage, seconds, timings=None):
+    """Record an already measured stage duration"""
+    if METRICS_ENABLED:
+        stage_seconds.observe(seconds, stage=stage)
+    timings = timings or _timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+def record_article(article):
+    """Record the fetch and extraction time of a freshly extracted article"""
+    timings = _timings.get()
+    if not METRICS_ENABLED and timings is None:
+        return
+    fetch_ms, extract_ms = article.get('fetch_ms'), article.get('extract_ms')
+    if fetch_ms is not None:
+        record("article_fetch", fetch_ms / 1000, timings)
+    if extract_ms is not None:
+        record("article_extract", extract_ms / 1000, timings)
+    if timings is not None:
+        timings.add_article(article.get('url'), fetch_ms, extract_ms)
+
+def count_articles(outcome, count=1):
+    if METRICS_ENABLED and count:
+        articles_total.inc(count, outcome=outcome)
+
+def observe_batch(model, size):
+    if METRICS_ENABLED and size:
+        model_batch_size.observe(size, model=model)
+
+def count_request(endpoint, status):
+    if METRICS_ENABLED:
+        requests_total.inc(endpoint=endpoint, status=status)
+
+@contextmanager
+def collect_timings():
+    """Collect the spans of the enclosed work (and the tasks/threads it starts) into a Timings"""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+def _gauge(name, documentation, labelname, values):
+    name = f"{METRICS_PREFIX}_{name}"
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for label, value in values.items():
+        lines.append(f'{name}{{{labelname}="{label}"}} {_number(value)}')
+    return lines
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    import cache
+    import workers
+
+    lines = []
+    for metric in (requests_total, stage_seconds, articles_total, model_batch_size):
+        lines.extend(metric.render())
+
+    cache_stats = {name: stats for name, stats in cache.stats().items() if isinstance(stats, dict)}
+    lookups = f"{METRICS_PREFIX}_cache_lookups_total"
+    lines += [f"# HELP {lookups} Cache lookups, by cache and result", f"# TYPE {lookups} counter"]
+    for name, stats in cache_stats.items():
+        for result in ("hits", "disk_hits", "misses"):
+            lines.append(f'{lookups}{{cache="{name}",result="{result}"}} {stats[result]}')
+    lines += _gauge("cache_hit_ratio", "Share of cache lookups served from memory or disk", "cache",
+                    {name: stats["hit_rate"] for name, stats in cache_stats.items()})
+    lines += _gauge("cache_entries", "Entries held in memory per cache", "cache",
+                    {name: stats["size"] for name, stats in cache_stats.items()})
+    lines += _gauge("queue_depth", "Admission and executor queue depths", "queue",
+                    workers.queue_depths())
+    return "\n".join(lines) + "\n"
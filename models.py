@@ -0,0 +1,222 @@
+"""
+Lazy, thread-safe registry for the models and corpora used by the analysis pipeline.
+
+Nothing heavy is imported or loaded until a model is first requested (or the
+/warmup endpoint is called). Set MODEL_CACHE_DIR to load models from a local
+cache directory, and MODELS_OFFLINE=1 to forbid all network access while loading.
+
+Checkpoints, the inference backend (fp32 torch, int8 dynamic quantization or
+ONNX Runtime) and per-worker thread counts are configurable; see
+evaluation.py for the accuracy check of a backend against fp32.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Local model cache; a sub-directory named after the task (e.g. "summarization")
+# holding a save_pretrained() checkpoint is loaded directly
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR")
+MODELS_OFFLINE = os.environ.get("MODELS_OFFLINE", "0") == "1"
+
+# Checkpoint per task; the defaults are the transformers pipeline defaults,
+# pinned so cached copies are reused
+SENTIMENT_MODEL = os.environ.get("SENTIMENT_MODEL", "distilbert-base-uncased-finetuned-sst-2-english")
+SUMMARIZATION_MODEL = os.environ.get("SUMMARIZATION_MODEL", "sshleifer/distilbart-cnn-12-6")
+
+# Inference backend: "torch" (fp32), "quantized" (torch int8 dynamic quantization)
+# or "onnx" (ONNX Runtime export through optimum)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+INFERENCE_BACKENDS = ("torch", "quantized", "onnx")
+
+# Threads per worker; 0 keeps the library default. With several inference
+# workers per machine, set these so workers x threads <= cores.
+INTRA_OP_THREADS = int(os.environ.get("INTRA_OP_THREADS", 0))
+INTER_OP_THREADS = int(os.environ.get("INTER_OP_THREADS", 0))
+
+if MODEL_CACHE_DIR:
+    os.environ.setdefault("HF_HUB_CACHE", MODEL_CACHE_DIR)
+    os.environ.setdefault("NLTK_DATA", os.path.join(MODEL_CACHE_DIR, "nltk_data"))
+if MODELS_OFFLINE:
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+class ModelRegistry:
+    """Loads named resources on first use, at most once, and records load state"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._items = {}
+        self._locks = {}
+        self._load_seconds = {}
+        self._errors = {}
+
+    def register(self, name, loader):
+        """Register a zero-argument loader under the given name"""
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        """Return the named resource, loading it if this is the first request"""
+        if name in self._items:
+            return self._items[name]
+        with self._locks[name]:
+            if name not in self._items:
+                started = time.perf_counter()
+                try:
+                    self._items[name] = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logger.error(f"Failed to load {name}: {str(e)}")
+                    raise
+                self._load_seconds[name] = round(time.perf_counter() - started, 3)
+                self._errors.pop(name, None)
+                logger.info(f"Loaded {name} in {self._load_seconds[name]}s")
+        return self._items[name]
+
+    def is_loaded(self, name):
+        return name in self._items
+
+    def ready(self):
+        """True once every registered resource has been loaded"""
+        return all(name in self._items for name in self._loaders)
+
+    def warmup(self, names=None):
+        """Load the given (or all) resources, returning the registry status"""
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+            except Exception:
+                pass
+        return self.status()
+
+    def status(self):
+        """Load state, load time and last error for every registered resource"""
+        return {
+            name: {
+                "loaded": name in self._items,
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name)
+            }
+            for name in self._loaders
+        }
+
+
+def _model_source(task, default_model):
+    """Prefer a task checkpoint saved in MODEL_CACHE_DIR over the hub name"""
+    if MODEL_CACHE_DIR:
+        local_path = os.path.join(MODEL_CACHE_DIR, task)
+        if os.path.isdir(local_path):
+            return local_path
+    return default_model
+
+_threads_configured = False
+_threads_lock = threading.Lock()
+
+def configure_threads():
+    """Apply INTRA_OP_THREADS / INTER_OP_THREADS to torch, once per process"""
+    global _threads_configured
+    with _threads_lock:
+        if _threads_configured:
+            return
+        _threads_configured = True
+        if not (INTRA_OP_THREADS or INTER_OP_THREADS):
+            return
+        import torch
+        if INTRA_OP_THREADS:
+            torch.set_num_threads(INTRA_OP_THREADS)
+        if INTER_OP_THREADS:
+            try:
+                torch.set_num_interop_threads(INTER_OP_THREADS)
+            except RuntimeError as e:
+                # Only allowed before the first parallel torch operation
+                logger.warning(f"Could not set inter-op threads: {str(e)}")
+
+def _onnx_session_options():
+    from onnxruntime import SessionOptions
+    options = SessionOptions()
+    if INTRA_OP_THREADS:
+        options.intra_op_num_threads = INTRA_OP_THREADS
+    if INTER_OP_THREADS:
+        options.inter_op_num_threads = INTER_OP_THREADS
+    return options
+
+def build_pipeline(task, model, backend=None):
+    """
+    Build a transformers pipeline for task from a checkpoint on the given
+    backend. Used by the registry and by the accuracy check in evaluation.py.
+    """
+    from transformers import pipeline
+
+    backend = backend or INFERENCE_BACKEND
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+    configure_threads()
+
+    if backend == "onnx":
+        from transformers import AutoTokenizer
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+
+        model_class = ORTModelForSeq2SeqLM if task == "summarization" else ORTModelForSequenceClassification
+        ort_model = model_class.from_pretrained(model, export=True,
+                                                session_options=_onnx_session_options())
+        return pipeline(task, model=ort_model, tokenizer=AutoTokenizer.from_pretrained(model))
+
+    nlp = pipeline(task, model=model)
+    if backend == "quantized":
+        import torch
+        # int8 weights for every Linear layer; activations are quantized on the fly
+        nlp.model = torch.quantization.quantize_dynamic(nlp.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return nlp
+
+def _load_pipeline(task, default_model):
+    return build_pipeline(task, _model_source(task, default_model))
+
+def _load_sentiment_analyzer():
+    return _load_pipeline("sentiment-analysis", SENTIMENT_MODEL)
+
+def _load_summarizer():
+    return _load_pipeline("summarization", SUMMARIZATION_MODEL)
+
+def _load_stopwords():
+    """NLTK English stopwords, downloaded only when missing and allowed"""
+    from nltk.corpus import stopwords
+    try:
+        return list(stopwords.words('english'))
+    except LookupError:
+        if not MODELS_OFFLINE:
+            import nltk
+            nltk.download('stopwords', quiet=True, download_dir=os.environ.get("NLTK_DATA"))
+            try:
+                return list(stopwords.words('english'))
+            except LookupError:
+                pass
+    logger.warning("NLTK stopwords unavailable, using scikit-learn's English list")
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return sorted(ENGLISH_STOP_WORDS)
+
+
+registry = ModelRegistry()
+registry.register("sentiment_analyzer", _load_sentiment_analyzer)
+registry.register("summarizer", _load_summarizer)
+registry.register("stopwords", _load_stopwords)
+
+def model_id(name):
+    """Checkpoint and backend of a registered model, used to key cached outputs"""
+    if name == "summarizer":
+        return f"{_model_source('summarization', SUMMARIZATION_MODEL)}@{INFERENCE_BACKEND}"
+    if name == "sentiment_analyzer":
+        return f"{_model_source('sentiment-analysis', SENTIMENT_MODEL)}@{INFERENCE_BACKEND}"
+    return name
+
+def get_sentiment_analyzer():
+    return registry.get("sentiment_analyzer")
+
+def get_summarizer():
+    return registry.get("summarizer")
+
+def get_stopwords():
+    return registry.get("stopwords")
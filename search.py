@@ -0,0 +1,381 @@
+"""
+Hedged multi-provider news search.
+
+All configured providers are queried concurrently. Once SEARCH_DEADLINE passes,
+the search continues with whatever results have arrived. URLs are canonicalized
+(redirect wrappers unwrapped, tracking parameters stripped) and deduplicated
+before the top N are picked. Google News article links are decoded to the
+publisher URL; links that cannot be decoded are ranked after every direct link.
+Providers are interleaved in order of their recorded health, so slow or failing
+providers are deprioritized automatically.
+
+Each provider takes a base_url so it can be pointed at a local stub server.
+"""
+import base64
+import binascii
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, quote_plus, urlencode, urljoin, urlparse, urlunparse
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PROVIDERS = os.environ.get("SEARCH_PROVIDERS", "newsapi,googlenews,gnews")
+SEARCH_DEADLINE = float(os.environ.get("SEARCH_DEADLINE", 6))
+NEWSAPI_KEY = os.environ.get("NEWSAPI_KEY", "ceb40821cbb544a4be6619f0875a76c1")
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Query parameters that only track the click and never change the article
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ocid", "cmpid",
+    "ref", "ref_src", "referrer", "guccounter", "guce_referrer", "guce_referrer_sig",
+    "soc_src", "soc_trk", "sr_share", "smid", "smtyp", "taid", "yptr", "ito", "mod"
+}
+TRACKING_PREFIXES = ("utm_", "__twitter", "_hs", "mkt_", "pk_")
+
+# Redirect wrappers that carry the target URL in a query parameter
+REDIRECT_PARAMS = {
+    "www.google.com": ("url", "q"),
+    "google.com": ("url", "q"),
+    "l.facebook.com": ("u",),
+    "lm.facebook.com": ("u",),
+    "t.umblr.com": ("z",),
+    "out.reddit.com": ("url",),
+    "www.bing.com": ("url",),
+    "news.yahoo.com": ("url",),
+    "r.search.yahoo.com": ("RU",)
+}
+
+# news.google.com path prefixes followed by an encoded article id
+GOOGLE_NEWS_HOSTS = {"news.google.com"}
+GOOGLE_NEWS_PREFIXES = ("/rss/articles/", "/articles/", "/read/", "/__i/rss/rd/articles/")
+
+
+def _read_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def decode_google_news_url(url):
+    """
+    Publisher URL carried in a news.google.com article link, or None.
+
+    The article id is a base64-encoded protobuf message whose string fields
+    include the target URL. Newer opaque ids only resolve through Google's own
+    endpoints and return None.
+    """
+    parsed = urlparse(url.strip())
+    if parsed.netloc.lower() not in GOOGLE_NEWS_HOSTS:
+        return None
+    prefix = next((prefix for prefix in GOOGLE_NEWS_PREFIXES if parsed.path.startswith(prefix)), None)
+    if prefix is None:
+        return None
+    article_id = parsed.path[len(prefix):].split("/")[0]
+    try:
+        data = base64.urlsafe_b64decode(article_id + "=" * (-len(article_id) % 4))
+    except (binascii.Error, ValueError):
+        return None
+
+    pos = 0
+    try:
+        while pos < len(data):
+            tag, pos = _read_varint(data, pos)
+            wire_type = tag & 0x07
+            if wire_type == 0:
+                _, pos = _read_varint(data, pos)
+            elif wire_type == 2:
+                length, pos = _read_varint(data, pos)
+                value = data[pos:pos + length]
+                pos += length
+                if value.startswith((b"http://", b"https://")):
+                    return value.decode("utf-8")
+            else:
+                return None
+    except (IndexError, UnicodeDecodeError):
+        return None
+    return None
+
+
+def is_google_news_wrapper(url):
+    """Whether url is a news.google.com article link that still needs a redirect to resolve"""
+    parsed = urlparse(url)
+    return parsed.netloc.lower() in GOOGLE_NEWS_HOSTS and parsed.path.startswith(GOOGLE_NEWS_PREFIXES)
+
+
+def canonicalize_url(url):
+    """Canonical form of an article URL for deduplication"""
+    for _ in range(3):
+        decoded = decode_google_news_url(url)
+        if decoded is not None:
+            url = decoded
+            continue
+        parsed = urlparse(url.strip())
+        params = REDIRECT_PARAMS.get(parsed.netloc.lower())
+        if not params:
+            break
+        query = dict(parse_qsl(parsed.query))
+        target = next((query[name] for name in params if query.get(name, "").startswith("http")), None)
+        if target is None:
+            break
+        url = target
+
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower() or "https"
+    host = parsed.hostname.lower() if parsed.hostname else ""
+    if parsed.port and not ((scheme == "http" and parsed.port == 80) or
+                            (scheme == "https" and parsed.port == 443)):
+        host = f"{host}:{parsed.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    path = parsed.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunparse((scheme, host, path, "", urlencode(query), ""))
+
+
+class ProviderStats:
+    """Exponentially weighted latency, error rate and deadline-miss rate of one provider"""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.timeout_rate = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.latency = seconds if self.latency is None else (
+                self.alpha * seconds + (1 - self.alpha) * self.latency)
+            self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+
+    def record_deadline(self, missed):
+        """Record whether a search finished within the deadline; a hung call never reaches record()"""
+        with self._lock:
+            if missed:
+                self.timeouts += 1
+            self.timeout_rate = self.alpha * (1.0 if missed else 0.0) + (1 - self.alpha) * self.timeout_rate
+
+    def score(self):
+        """Lower is better: expected latency plus a deadline-sized penalty per expected error or miss"""
+        if self.latency is None and not self.timeouts:
+            return 0.0
+        return (self.latency or 0.0) + (self.error_rate + self.timeout_rate) * SEARCH_DEADLINE
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "latency_ewma": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate_ewma": round(self.error_rate, 3),
+            "timeout_rate_ewma": round(self.timeout_rate, 3),
+            "score": round(self.score(), 3)
+        }
+
+
+class SearchProvider:
+    """A news source returning candidate article URLs for a query"""
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = ProviderStats()
+
+    def search(self, session, query, limit, timeout):
+        raise NotImplementedError
+
+
+class NewsAPIProvider(SearchProvider):
+    name = "newsapi"
+
+    def __init__(self, api_key=NEWSAPI_KEY, base_url="https://newsapi.org"):
+        super().__init__()
+        self.api_key = api_key
+        self.base_url = base_url
+
+    def search(self, session, query, limit, timeout):
+        url = f"{self.base_url}/v2/everything?q={quote_plus(query)}&apiKey={self.api_key}"
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get('status') != 'ok':
+            raise RuntimeError(f"Failed to retrieve news: {data.get('message')}")
+        return [article['url'] for article in data['articles'] if article.get('url')][:limit]
+
+
+class GoogleNewsProvider(SearchProvider):
+    """Scrapes the Google News search page"""
+
+    name = "googlenews"
+
+    def __init__(self, base_url="https://news.google.com"):
+        super().__init__()
+        self.base_url = base_url
+
+    def search(self, session, query, limit, timeout):
+        from bs4 import BeautifulSoup
+
+        url = f"{self.base_url}/search?q={quote_plus(query)}&hl=en-US&gl=US&ceid=US:en"
+        response = session.get(url, headers={'User-Agent': USER_AGENT}, timeout=timeout)
+        response.raise_for_status()
+
+        soup = BeautifulSoup(response.text, 'lxml')
+        articles = []
+        # Find all article elements
+        for article in soup.find_all('article'):
+            link = article.find('a', href=True)
+            if link:
+                articles.append(urljoin(self.base_url + "/", link['href']))
+        return articles[:limit]
+
+
+class GNewsProvider(SearchProvider):
+    """Google News RSS search feed"""
+
+    name = "gnews"
+
+    def __init__(self, base_url="https://news.google.com"):
+        super().__init__()
+        self.base_url = base_url
+
+    def search(self, session, query, limit, timeout):
+        url = f"{self.base_url}/rss/search?q={quote_plus(query)}&hl=en-US&gl=US&ceid=US:en"
+        response = session.get(url, headers={'User-Agent': USER_AGENT}, timeout=timeout)
+        response.raise_for_status()
+
+        root = ElementTree.fromstring(response.content)
+        links = (item.findtext('link') for item in root.iter('item'))
+        return [link.strip() for link in links if link and link.strip()][:limit]
+
+
+class StubProvider(SearchProvider):
+    """Returns fixed URLs after an optional delay, for tests and benchmarks"""
+
+    name = "stub"
+
+    def __init__(self, urls, delay=0.0, name="stub"):
+        super().__init__()
+        self.urls = list(urls)
+        self.delay = delay
+        self.name = name
+
+    def search(self, session, query, limit, timeout):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.urls[:limit]
+
+
+PROVIDER_TYPES = {
+    "newsapi": NewsAPIProvider,
+    "googlenews": GoogleNewsProvider,
+    "gnews": GNewsProvider
+}
+
+
+class SearchService:
+    """Queries every provider concurrently and merges the results"""
+
+    def __init__(self, providers, deadline=SEARCH_DEADLINE):
+        self.providers = list(providers)
+        self.deadline = deadline
+
+    def _run(self, provider, session, query, limit):
+        started = time.perf_counter()
+        try:
+            urls = provider.search(session, query, limit, self.deadline)
+        except Exception as e:
+            provider.stats.record(time.perf_counter() - started, ok=False)
+            logger.error(f"Search provider {provider.name} failed: {str(e)}")
+            return []
+        provider.stats.record(time.perf_counter() - started, ok=True)
+        return urls
+
+    def search(self, session, query, limit=10):
+        if not self.providers:
+            return []
+        # Healthiest providers first; their results win ties in the merge
+        providers = sorted(self.providers, key=lambda provider: provider.stats.score())
+        executor = ThreadPoolExecutor(max_workers=len(providers))
+        try:
+            futures = [executor.submit(self._run, provider, session, query, limit)
+                       for provider in providers]
+            done, _ = wait(futures, timeout=self.deadline)
+        finally:
+            # Late providers finish in the background and still update their stats
+            executor.shutdown(wait=False)
+
+        results = []
+        for provider, future in zip(providers, futures):
+            provider.stats.record_deadline(missed=future not in done)
+            if future in done:
+                results.append(future.result())
+            else:
+                logger.error(f"Search provider {provider.name} missed the {self.deadline}s deadline")
+        return merge_results(results, limit)
+
+    def stats(self):
+        return {provider.name: provider.stats.as_dict() for provider in self.providers}
+
+
+def merge_results(result_lists, limit):
+    """
+    Interleave ranked URL lists, dropping canonical duplicates, and keep the top N.
+    Google News links that could not be decoded only fill slots left over by
+    direct links: they share one host and yield little article content.
+    """
+    merged, wrapped, seen = [], [], set()
+    for rank in range(max((len(urls) for urls in result_lists), default=0)):
+        for urls in result_lists:
+            if rank >= len(urls):
+                continue
+            canonical = canonicalize_url(urls[rank])
+            if canonical in seen:
+                continue
+            seen.add(canonical)
+            if is_google_news_wrapper(canonical):
+                wrapped.append(canonical)
+                continue
+            merged.append(canonical)
+            if len(merged) >= limit:
+                return merged
+    return merged + wrapped[:limit - len(merged)]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    """Process-wide search service built from SEARCH_PROVIDERS"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                names = [name.strip() for name in SEARCH_PROVIDERS.split(",") if name.strip()]
+                providers = [PROVIDER_TYPES[name]() for name in names if name in PROVIDER_TYPES]
+                _service = SearchService(providers)
+    return _service
+
+def set_providers(providers, deadline=SEARCH_DEADLINE):
+    """Replace the providers of the process-wide service (e.g. stubs in tests)"""
+    global _service
+    with _service_lock:
+        _service = SearchService(providers, deadline)
+    return _service
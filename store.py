@@ -0,0 +1,146 @@
+"""
+Persistent store of per-article analysis results.
+
+Every analysis writes its article records (url, title, summary, sentiment,
+score, topics, company and fetch time) to a SQLite database at
+ARTICLE_STORE_PATH. Articles and their topics are indexed by company and fetch
+time, so time-bucketed sentiment series and top topics over a date range are
+answered from the indexes without fetching or running a model again.
+Each URL is stored once per company, at the time it was first fetched.
+Set ARTICLE_STORE_ENABLED=0 to turn recording off.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_STORE_ENABLED = os.environ.get("ARTICLE_STORE_ENABLED", "1") == "1"
+ARTICLE_STORE_PATH = os.environ.get("ARTICLE_STORE_PATH", "articles.sqlite3")
+
+# Bucket width and offset from the epoch in seconds; weeks start on Monday
+BUCKETS = {
+    "hour": (3600, 0),
+    "day": (86400, 0),
+    "week": (7 * 86400, 4 * 86400)
+}
+
+
+class ArticleStore:
+    """Article records in SQLite, indexed by company and fetch time"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "company TEXT, company_name TEXT, url TEXT, title TEXT, summary TEXT, "
+            "sentiment TEXT, score REAL, topics TEXT, fetched_at REAL, "
+            "PRIMARY KEY (company, url))")
+        # Covering indexes: range queries never touch the table rows
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS articles_company_time "
+            "ON articles (company, fetched_at, sentiment, score)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS article_topics ("
+            "company TEXT, url TEXT, topic TEXT, fetched_at REAL, PRIMARY KEY (company, url, topic))")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS article_topics_company_time "
+            "ON article_topics (company, fetched_at, topic)")
+
+    def add(self, company, company_name, articles):
+        """
+        Insert article records, keeping the first fetch time of URLs already stored
+        for the company; the other fields are refreshed.
+        """
+        now = time.time()
+        rows, topic_rows = [], []
+        for article in articles:
+            fetched_at = article.get('fetched_at') or now
+            sentiment = article.get('sentiment') or {}
+            topics = list(article.get('topics') or [])
+            rows.append((company, company_name, article['url'], article.get('title'),
+                         article.get('summary'), sentiment.get('sentiment', 'Neutral'),
+                         float(sentiment.get('score', 0.0)), json.dumps(topics), fetched_at))
+            topic_rows.extend((article['url'], topic) for topic in topics)
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (company, url) DO UPDATE SET company_name = excluded.company_name, "
+                    "title = excluded.title, summary = excluded.summary, sentiment = excluded.sentiment, "
+                    "score = excluded.score, topics = excluded.topics", rows)
+                self._conn.executemany(
+                    "DELETE FROM article_topics WHERE company = ? AND url = ?",
+                    [(company, row[2]) for row in rows])
+                # Topics take the stored fetch time of their article
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO article_topics SELECT ?, ?, ?, fetched_at FROM articles "
+                    "WHERE company = ? AND url = ?",
+                    [(company, url, topic, company, url) for url, topic in topic_rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def sentiment_series(self, company, start, end, bucket="day"):
+        """Article count, sentiment counts and scores per time bucket in [start, end)"""
+        width, offset = BUCKETS[bucket]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CAST((fetched_at - ?) / ? AS INTEGER) AS bucket, COUNT(*), "
+                "SUM(sentiment = 'Positive'), SUM(sentiment = 'Negative'), SUM(sentiment = 'Neutral'), "
+                "AVG(score) FROM articles WHERE company = ? AND fetched_at >= ? AND fetched_at < ? "
+                "GROUP BY bucket ORDER BY bucket",
+                (offset, width, company, start, end)).fetchall()
+        return [
+            {
+                "start": bucket_index * width + offset,
+                "articles": count,
+                "sentiment_distribution": {"Positive": positive, "Negative": negative, "Neutral": neutral},
+                "average_sentiment_score": round(average, 2),
+                # Share of positive minus share of negative articles, from -1 to 1
+                "net_sentiment": round((positive - negative) / count, 3)
+            }
+            for bucket_index, count, positive, negative, neutral, average in rows
+        ]
+
+    def top_topics(self, company, start, end, limit=10):
+        """Topics by number of articles mentioning them in [start, end)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT topic, COUNT(*) AS articles FROM article_topics "
+                "WHERE company = ? AND fetched_at >= ? AND fetched_at < ? "
+                "GROUP BY topic ORDER BY articles DESC, topic LIMIT ?",
+                (company, start, end, limit)).fetchall()
+        return [(topic, count) for topic, count in rows]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Process-wide article store on ARTICLE_STORE_PATH"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArticleStore(ARTICLE_STORE_PATH)
+    return _store
+
+def record_articles(company, company_name, articles):
+    """Store the article records of one analysis; failures are logged, never raised"""
+    if not ARTICLE_STORE_ENABLED or not articles:
+        return 0
+    try:
+        return get_store().add(company, company_name, articles)
+    except Exception as e:
+        logger.error(f"Failed to store articles for {company_name}: {str(e)}")
+        return 0
@@ -0,0 +1,245 @@
+"""
+Translation service for the Hindi summary path.
+
+Text is split into sentences; each sentence is looked up in the translation
+cache and only the uncached ones are sent to the backend, in batches. The
+summary text is a template: its sentences keep numbered placeholders through
+translation and the values (company, counts, topics, score) are filled in
+afterwards, so every template sentence is translated once and reused across
+companies. Text values are translated as segments of their own; numbers are
+kept as they are.
+
+Backends are pluggable: "google" (googletrans, one reused client), "local"
+(an offline MarianMT model through transformers) and "stub" (no network, for
+tests and load testing). Choose one with TRANSLATION_BACKEND.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+import cache
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_BACKEND = os.environ.get("TRANSLATION_BACKEND", "google")
+TRANSLATION_BATCH_SIZE = int(os.environ.get("TRANSLATION_BATCH_SIZE", 16))
+TRANSLATION_RETRIES = int(os.environ.get("TRANSLATION_RETRIES", 2))
+LOCAL_TRANSLATION_MODEL = os.environ.get("LOCAL_TRANSLATION_MODEL", "Helsinki-NLP/opus-mt-en-hi")
+
+# Sentence boundaries and line breaks; the separators themselves are kept as-is
+_SEGMENT_PATTERN = re.compile(r'(\s*\n\s*|(?<=[.!?])\s+)')
+# Named template placeholders, and the numbered tokens they become for the backend
+_PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+_TOKEN_PATTERN = re.compile(r'\{(\d+)\}')
+_NUMBER_PATTERN = re.compile(r'^[\d.,%+-]+$')
+
+
+class TranslationBackend:
+    """Translates a batch of segments; subclasses implement translate_batch"""
+
+    name = "base"
+
+    def translate_batch(self, texts, src, dest):
+        raise NotImplementedError
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    """googletrans client created once and reused, with retries"""
+
+    name = "google"
+
+    def __init__(self, retries=TRANSLATION_RETRIES):
+        self.retries = retries
+        self._translator = None
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts, src, dest):
+        for attempt in range(self.retries + 1):
+            try:
+                with self._lock:
+                    if self._translator is None:
+                        from googletrans import Translator
+                        self._translator = Translator()
+                    results = self._translator.translate(list(texts), src=src, dest=dest)
+                return [result.text for result in results]
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logger.error(f"Translation attempt {attempt + 1} failed, retrying: {str(e)}")
+                # Start over with a fresh client and back off without holding the lock
+                with self._lock:
+                    self._translator = None
+                time.sleep(0.5 * 2 ** attempt)
+
+
+class LocalModelBackend(TranslationBackend):
+    """Offline translation with a local transformers checkpoint"""
+
+    name = "local"
+
+    def __init__(self, model=LOCAL_TRANSLATION_MODEL):
+        self.model = model
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts, src, dest):
+        with self._lock:
+            if self._pipeline is None:
+                from transformers import pipeline
+                self._pipeline = pipeline("translation", model=self.model)
+            outputs = self._pipeline(list(texts), batch_size=TRANSLATION_BATCH_SIZE)
+        return [output['translation_text'] for output in outputs]
+
+
+class StubBackend(TranslationBackend):
+    """Deterministic fake translation with an optional per-batch delay"""
+
+    name = "stub"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def translate_batch(self, texts, src, dest):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return [f"[{dest}] {text}" for text in texts]
+
+
+BACKENDS = {
+    "google": GoogleTranslateBackend,
+    "local": LocalModelBackend,
+    "stub": StubBackend
+}
+
+
+def split_segments(text):
+    """Split text into alternating [segment, separator, segment, ...] parts"""
+    return _SEGMENT_PATTERN.split(text)
+
+def _is_number(value):
+    return isinstance(value, (int, float)) or _NUMBER_PATTERN.match(str(value)) is not None
+
+def _format_value(value, translate=None):
+    """A template value as text; lists are comma-separated, numbers never translated"""
+    if isinstance(value, (list, tuple)):
+        return ', '.join(_format_value(item, translate) for item in value)
+    if translate is None or _is_number(value):
+        return str(value)
+    return translate(str(value))
+
+def _text_values(value):
+    """The strings of a template value that need translating"""
+    if isinstance(value, (list, tuple)):
+        return [item for element in value for item in _text_values(element)]
+    return [] if _is_number(value) else [str(value)]
+
+def fill_template(template, values):
+    """Fill the {name} placeholders of a template, untranslated"""
+    return _PLACEHOLDER_PATTERN.sub(lambda match: _format_value(values[match.group(1)]), template)
+
+
+class TranslationService:
+    """Sentence-level cached translation on top of a backend"""
+
+    def __init__(self, backend, batch_size=TRANSLATION_BATCH_SIZE, translation_cache=None):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.cache = translation_cache or cache.translation_cache
+        self.segments_translated = 0
+
+    def _key(self, segment, src, dest):
+        return f"{self.backend.name}|{src}|{dest}|{cache.content_hash(segment)}"
+
+    def _translate_segments(self, segments, src, dest):
+        """{segment: translation} for the non-blank segments, through the cache"""
+        segments = {segment for segment in segments if segment.strip()}
+        translations = {}
+        for segment in segments:
+            cached = self.cache.get(self._key(segment, src, dest))
+            if cached is not None:
+                translations[segment] = cached
+
+        missing = sorted(segments - translations.keys())
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            for segment, translated in zip(batch, self.backend.translate_batch(batch, src, dest)):
+                translations[segment] = translated
+                self.cache.set(self._key(segment, src, dest), translated)
+            self.segments_translated += len(batch)
+        return translations
+
+    def translate(self, text, src='en', dest='hi', values=None):
+        """
+        Translate text sentence by sentence. With values, text is a template
+        whose {name} placeholders are filled after translation.
+        """
+        if values is not None:
+            return self.translate_template(text, values, src, dest)
+        parts = split_segments(text)
+        # Even positions are sentences, odd positions the separators between them
+        translations = self._translate_segments(parts[::2], src, dest)
+        return ''.join(
+            translations.get(part, part) if i % 2 == 0 else part
+            for i, part in enumerate(parts)
+        )
+
+    def translate_template(self, template, values, src='en', dest='hi'):
+        """
+        Translate a template and fill it with values. Each sentence is sent with
+        its placeholders numbered ({0}, {1}, ...), so the cached translation is
+        shared by every set of values. A sentence whose translation lost a
+        placeholder is translated again with its values filled in.
+        """
+        parts = split_segments(template)
+        sentences = []
+        for part in parts[::2]:
+            names = []
+            def number(match):
+                names.append(match.group(1))
+                return "{" + str(len(names) - 1) + "}"
+            sentences.append((_PLACEHOLDER_PATTERN.sub(number, part), names))
+
+        words = {text for value in values.values() for text in _text_values(value)}
+        translations = self._translate_segments(
+            {sentence for sentence, _ in sentences} | words, src, dest)
+        localized = {name: _format_value(value, lambda text: translations.get(text, text))
+                     for name, value in values.items()}
+
+        output = []
+        for i, part in enumerate(parts):
+            if i % 2:
+                output.append(part)
+                continue
+            sentence, names = sentences[i // 2]
+            translated = translations.get(sentence, sentence)
+            if sorted(set(_TOKEN_PATTERN.findall(translated))) != sorted(str(k) for k in range(len(names))):
+                filled = fill_template(part, values)
+                output.append(self._translate_segments([filled], src, dest).get(filled, filled))
+                continue
+            output.append(_TOKEN_PATTERN.sub(lambda match: localized[names[int(match.group(1))]], translated))
+        return ''.join(output)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    """Process-wide translation service using the configured backend"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                backend = BACKENDS.get(TRANSLATION_BACKEND, GoogleTranslateBackend)()
+                _service = TranslationService(backend)
+    return _service
+
+def set_backend(backend):
+    """Swap the backend of the process-wide service (e.g. a StubBackend in tests)"""
+    global _service
+    with _service_lock:
+        _service = TranslationService(backend)
+    return _service
@@ -1,45 +1,119 @@
 import requests
-from bs4 import BeautifulSoup
-from transformers import pipeline
-from sklearn.feature_extraction.text import CountVectorizer
-from nltk.corpus import stopwords
-import nltk
 import numpy as np
-from gtts import gTTS
-from googletrans import Translator
 import math
-from gnews import GNews
-import requests
+import hashlib
+import io
 import logging
+import os
+import re
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from functools import lru_cache
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+import cache
+import extraction
+import metrics
+import models
+import search
+import translation
 
-# Initialize pipelines
-sentiment_analyzer = pipeline("sentiment-analysis")
-summarizer = pipeline("summarization")
+# Models, corpora and heavy libraries (torch, transformers, sklearn, gTTS,
+# googletrans) are loaded lazily on first use; see models.py and translation.py
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def search_news(company_name):
-    """Search for news articles using NewsAPI"""
+# Article fetch settings (overall concurrency, per-host concurrency, stage deadline in seconds)
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 10))
+FETCH_PER_HOST = int(os.environ.get("FETCH_PER_HOST", 2))
+FETCH_DEADLINE = float(os.environ.get("FETCH_DEADLINE", 20))
+
+# Shared HTTP session: per-host connection pools kept alive, and connections kept
+# per host (enough for the I/O and bulk fetch threads hitting one search host)
+HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", 100))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 32))
+
+# Number of inputs per forward pass for the summarization and sentiment models
+MODEL_BATCH_SIZE = int(os.environ.get("MODEL_BATCH_SIZE", 8))
+
+# Summarization mode ("truncate" or "chunked") and long-document limits
+SUMMARY_MODE = os.environ.get("SUMMARY_MODE", "truncate")
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 1024))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("SUMMARY_TOKEN_BUDGET", 3072))
+SUMMARY_MAX_CHUNKS = int(os.environ.get("SUMMARY_MAX_CHUNKS", 3))
+
+# Summarization tier, overridable per request: "quality" (abstractive model for
+# every article), "fast" (extractive only) or "balanced" (abstractive only for
+# articles of at least SUMMARY_ROUTE_MIN_WORDS words and the SUMMARY_ROUTE_TOP_K
+# most central others; see evaluation.py for the per-tier comparison)
+SUMMARY_TIER = os.environ.get("SUMMARY_TIER", "quality")
+SUMMARY_TIERS = ("fast", "balanced", "quality")
+if SUMMARY_TIER not in SUMMARY_TIERS:
+    logger.warning(f"Unknown SUMMARY_TIER {SUMMARY_TIER!r}, using 'quality'")
+    SUMMARY_TIER = "quality"
+SUMMARY_ROUTE_MIN_WORDS = int(os.environ.get("SUMMARY_ROUTE_MIN_WORDS", 400))
+SUMMARY_ROUTE_TOP_K = int(os.environ.get("SUMMARY_ROUTE_TOP_K", 2))
+
+# Sentiment mode ("truncate" or "windowed") and sliding-window settings
+SENTIMENT_MODE = os.environ.get("SENTIMENT_MODE", "truncate")
+SENTIMENT_AGGREGATION = os.environ.get("SENTIMENT_AGGREGATION", "weighted")
+SENTIMENT_WINDOW_TOKENS = int(os.environ.get("SENTIMENT_WINDOW_TOKENS", 512))
+SENTIMENT_WINDOW_OVERLAP = int(os.environ.get("SENTIMENT_WINDOW_OVERLAP", 64))
+SENTIMENT_MAX_WINDOWS = int(os.environ.get("SENTIMENT_MAX_WINDOWS", 16))
+# Include the per-window breakdown in each article's sentiment (windowed mode only)
+SENTIMENT_RETURN_WINDOWS = os.environ.get("SENTIMENT_RETURN_WINDOWS", "0") == "1"
+
+# Speech backend: "gtts" (Google Text-to-Speech) or "stub" (placeholder bytes
+# after TTS_STUB_DELAY seconds, no network; for tests and benchmarks)
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "gtts")
+TTS_STUB_DELAY = float(os.environ.get("TTS_STUB_DELAY", 0))
+
+_session = None
+_session_lock = threading.Lock()
+# host -> [semaphore, fetches using it]; idle hosts are dropped
+_host_semaphores = {}
+_speech_locks = {}
+
+def get_http_session():
+    """Return the shared keep-alive HTTP session used for all outbound requests"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS,
+                                      pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+def _claim_host(host):
+    """Per-host semaphore limiting concurrent connections to one publisher; pair with _unclaim_host"""
+    with _session_lock:
+        entry = _host_semaphores.get(host)
+        if entry is None:
+            entry = _host_semaphores[host] = [threading.BoundedSemaphore(FETCH_PER_HOST), 0]
+        entry[1] += 1
+        return entry[0]
+
+def _unclaim_host(host):
+    with _session_lock:
+        entry = _host_semaphores[host]
+        entry[1] -= 1
+        if not entry[1]:
+            del _host_semaphores[host]
+
+def search_news(company_name, limit=10):
+    """Search for news articles across all configured providers (see search.py)"""
     try:
-        api_key = "ceb40821cbb544a4be6619f0875a76c1"  # Replace with your actual NewsAPI key
-        url = f"https://newsapi.org/v2/everything?q={company_name}&apiKey={api_key}"
-        
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        if data['status'] == 'ok':
-            articles = data['articles']
-            article_urls = [article['url'] for article in articles]
-            return article_urls[:10]  # Return top 10 articles
-        else:
-            logger.error(f"Failed to retrieve news: {data['message']}")
-            return []
-    
+        with metrics.span("search"):
+            return search.get_service().search(get_http_session(), company_name, limit)
     except Exception as e:
         logger.error(f"Error searching for news: {str(e)}")
         return []
@@ -47,39 +121,13 @@ def search_news(company_name):
 def manual_news_search(query):
     """Fallback manual search using Google News"""
     try:
-        url = f"https://news.google.com/search?q={query}&hl=en-US&gl=US&ceid=US:en"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        articles = []
-        
-        # Find all article elements
-        for article in soup.find_all('article'):
-            link = article.find('a', href=True)
-            if link and 'href' in link.attrs:
-                article_url = f"https://news.google.com{link['href'][1:]}"
-                articles.append(article_url)
-        
-        return articles[:10]
-    
+        provider = search.GoogleNewsProvider()
+        return [search.canonicalize_url(url)
+                for url in provider.search(get_http_session(), query, 10, 15)]
     except Exception as e:
         logger.error(f"Manual search failed: {str(e)}")
         return default_fallback_articles()
-    
-    except Exception as e:
-        print(f"Error searching for news: {e}")
-        # Return a few default news sites as fallback
-        return [
-            "https://www.reuters.com/",
-            "https://www.bloomberg.com/",
-            "https://www.cnbc.com/",
-            "https://www.bbc.com/news"
-        ]
+
 def default_fallback_articles():
     """Return reliable default news sources"""
     return [
@@ -90,144 +138,672 @@ def default_fallback_articles():
         "https://www.bbc.com/news"
     ]
 
-def extract_article_content(url):
-    """Improved article content extraction with multiple fallback methods"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.5'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Try multiple content extraction strategies
-        content = ""
-        selectors = [
-            {'name': 'article', 'selectors': ['article']},
-            {'name': 'main content', 'selectors': ['main', '.article-body']},
-            {'name': 'generic content', 'selectors': ['body']}
-        ]
-        
-        for strategy in selectors:
-            for selector in strategy['selectors']:
-                element = soup.select_one(selector)
-                if element:
-                    paragraphs = element.find_all(['p', 'h1', 'h2', 'h3'])
-                    content = ' '.join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
-                    if len(content) > 500:  # Only return if substantial content
-                        return {
-                            'title': soup.title.get_text(strip=True) if soup.title else "News Article",
-                            'content': content,
-                            'url': url
-                        }
-        
-        # Fallback to simple text extraction
-        return {
-            'title': soup.title.get_text(strip=True) if soup.title else "News Article",
-            'content': ' '.join([p.get_text(strip=True) for p in soup.find_all('p')]),
-            'url': url
-        }
-    
-    except Exception as e:
-        logger.error(f"Failed to extract content from {url}: {str(e)}")
-        return None
-
-def extract_article_content(url):
+def extract_article_content(url, timeout=15):
     """Extract content from a news article URL."""
+    return extraction.extract_article(get_http_session(), url, timeout=timeout)
+
+def iter_fetched_articles(urls, max_workers=None, per_host=None, deadline=None, refresh=False):
+    """
+    Fetch and extract article URLs concurrently over the shared session, yielding
+    each article as soon as it is ready (cached articles first, unless refresh is set).
+    Concurrency is capped overall and per host; articles that have not finished
+    when the stage deadline expires are dropped.
+    """
+    max_workers = max_workers or FETCH_MAX_WORKERS
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+    if not urls:
+        return
+
+    # Serve previously extracted articles from the cache
+    pending_urls = []
+    for url in urls:
+        article = None if refresh else cache.article_cache.get(url)
+        if article is not None:
+            metrics.count_articles("cached")
+            yield article
+        else:
+            pending_urls.append(url)
+    if not pending_urls:
+        return
+
+    start = time.monotonic()
+    semaphores = {}
+
+    def fetch(url):
+        host = urlparse(url).netloc.lower()
+        if per_host:
+            semaphore = semaphores.setdefault(host, threading.BoundedSemaphore(per_host))
+        else:
+            semaphore = _claim_host(host)
+        try:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0 or not semaphore.acquire(timeout=remaining):
+                return None
+            try:
+                remaining = deadline - (time.monotonic() - start)
+                if remaining <= 0:
+                    return None
+                return extract_article_content(url, timeout=remaining)
+            finally:
+                semaphore.release()
+        finally:
+            if not per_host:
+                _unclaim_host(host)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(pending_urls)))
+    futures = {executor.submit(fetch, url): url for url in pending_urls}
+    finished = 0
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Improved content extraction
-        article_body = soup.find('article') or soup.find('main') or soup.body
-        paragraphs = article_body.find_all(['p', 'h1', 'h2', 'h3']) if article_body else []
-        
-        content = ' '.join([p.text.strip() for p in paragraphs if p.text.strip()])
-        return {
-            'title': soup.title.text.strip() if soup.title else "No title",
-            'content': content,
-            'url': url
-        }
-    except Exception as e:
-        print(f"Error extracting from {url}: {e}")
-        return None
+        remaining = deadline - (time.monotonic() - start)
+        for future in as_completed(futures, timeout=max(remaining, 0)):
+            finished += 1
+            if future.exception() is None and future.result():
+                metrics.record_article(future.result())
+                metrics.count_articles("fetched")
+                cache.article_cache.set(futures[future], future.result())
+                yield future.result()
+            else:
+                metrics.count_articles("failed")
+    except FuturesTimeoutError:
+        metrics.count_articles("timed_out", len(futures) - finished)
+        logger.error(f"Fetch deadline of {deadline}s exceeded, dropping "
+                     f"{len(futures) - finished} article(s)")
+    finally:
+        # Do not wait for stragglers; their own request timeout ends them
+        executor.shutdown(wait=False, cancel_futures=True)
 
+def fetch_articles(urls, max_workers=None, per_host=None, deadline=None, refresh=False):
+    """
+    Fetch and extract all article URLs concurrently over the shared session.
+    Articles that miss the stage deadline are dropped. Results keep the input order.
+    """
+    articles = list(iter_fetched_articles(urls, max_workers, per_host, deadline, refresh))
+    position = {url: i for i, url in reversed(list(enumerate(urls)))}
+    return sorted(articles, key=lambda article: position.get(article['url'], len(urls)))
 
-def summarize_text(text, max_length=150):
-    """Generate a concise summary of the given text."""
-    if len(text) < 50:  # Skip summarization for very short texts
-        return text[:max_length] + "..." if len(text) > max_length else text
-    
-    # Calculate dynamic max_length (50-70% of text length)
+
+def _summary_length(text, max_length):
+    """Calculate dynamic max_length (50-70% of text length)"""
     text_length = len(text.split())
-    dynamic_max = max(30, min(int(text_length * 0.7), max_length))
-    
+    return max(30, min(int(text_length * 0.7), max_length))
+
+def _summarize_one(text, dynamic_max, max_chars=1024):
+    """Summarize a single text, falling back to truncation on failure"""
     try:
         # Use a summarization model to get a concise summary
-        summary = summarizer(
-            text[:1024],  # Truncate to model's max input length
+        return models.get_summarizer()(
+            text[:max_chars],  # Truncate to model's max input length
             max_length=dynamic_max,
             min_length=int(dynamic_max * 0.5),
             do_sample=False
         )[0]['summary_text']
-        
-        return summary
     except Exception as e:
         logger.error(f"Summarization failed: {str(e)}")
         # Fallback to simple text truncation
         return text[:dynamic_max] + "..."
 
+def summarize_batch(texts, max_length=150, batch_size=None, max_chars=1024):
+    """
+    Summarize a list of texts with batched model calls.
+    Texts sharing the same generation lengths are sent together, sorted by length
+    so each padded batch holds similarly sized inputs. Results match summarize_text.
+    Pass max_chars=None for inputs that are already token-bounded.
+    """
+    batch_size = batch_size or MODEL_BATCH_SIZE
+    summaries = [None] * len(texts)
+    groups = defaultdict(list)
 
+    for i, text in enumerate(texts):
+        if len(text) < 50:  # Skip summarization for very short texts
+            summaries[i] = text[:max_length] + "..." if len(text) > max_length else text
+        else:
+            groups[_summary_length(text, max_length)].append(i)
 
+    for dynamic_max, indices in groups.items():
+        indices.sort(key=lambda i: len(texts[i][:max_chars]))
+        metrics.observe_batch("summarizer", len(indices))
+        try:
+            outputs = models.get_summarizer()(
+                [texts[i][:max_chars] for i in indices],
+                max_length=dynamic_max,
+                min_length=int(dynamic_max * 0.5),
+                do_sample=False,
+                batch_size=batch_size
+            )
+            for i, output in zip(indices, outputs):
+                summaries[i] = output['summary_text']
+        except Exception as e:
+            logger.error(f"Batched summarization failed, retrying per article: {str(e)}")
+            for i in indices:
+                summaries[i] = _summarize_one(texts[i], dynamic_max, max_chars)
 
-nltk.download('stopwords')
-logger = logging.getLogger(__name__)
+    return summaries
+
+def summarize_text(text, max_length=150):
+    """Generate a concise summary of the given text."""
+    return summarize_batch([text], max_length=max_length)[0]
+
+def _split_into_chunks(text, chunk_tokens, token_budget, max_chunks):
+    """Split text into token-bounded chunks using the summarizer's tokenizer"""
+    tokenizer = models.get_summarizer().tokenizer
+    token_ids = tokenizer(text, add_special_tokens=False, verbose=False)['input_ids']
+    token_ids = token_ids[:token_budget]
+    chunks = []
+    for start in range(0, len(token_ids), chunk_tokens):
+        if len(chunks) >= max_chunks:
+            break
+        chunk = tokenizer.decode(token_ids[start:start + chunk_tokens], skip_special_tokens=True)
+        if chunk.strip():
+            chunks.append(chunk)
+    return chunks
+
+def summarize_long_batch(texts, max_length=150, token_budget=None, max_chunks=None,
+                         reduce=True, batch_size=None):
+    """
+    Map-reduce summarization for long articles.
+    Each text is split into token-bounded chunks (at most token_budget tokens and
+    max_chunks chunks per article), all chunks are summarized in one batch, and
+    when reduce is set the joined chunk summaries of multi-chunk articles are
+    summarized again. Returns the summaries and a stats dict with chunk counts
+    and per-stage timings in seconds.
+    """
+    token_budget = token_budget or SUMMARY_TOKEN_BUDGET
+    max_chunks = max_chunks or SUMMARY_MAX_CHUNKS
+    stats = {'chunks': [0] * len(texts), 'total_chunks': 0,
+             'chunk_seconds': 0.0, 'map_seconds': 0.0, 'reduce_seconds': 0.0}
+    summaries = [None] * len(texts)
+
+    # Leave room for special tokens and re-tokenization drift of decoded chunks
+    try:
+        model_limit = getattr(models.get_summarizer().tokenizer, 'model_max_length', SUMMARY_CHUNK_TOKENS)
+    except Exception as e:
+        logger.error(f"Chunked summarization failed: {str(e)}")
+        return summarize_batch(texts, max_length, batch_size), stats
+    chunk_tokens = max(16, min(SUMMARY_CHUNK_TOKENS, model_limit) - 16)
+
+    started = time.perf_counter()
+    chunk_texts, owners = [], []
+    for i, text in enumerate(texts):
+        if len(text) < 50:
+            summaries[i] = summarize_text(text, max_length)
+            continue
+        try:
+            chunks = _split_into_chunks(text, chunk_tokens, token_budget, max_chunks)
+        except Exception as e:
+            logger.error(f"Chunking failed, falling back to truncation: {str(e)}")
+            chunks = [text[:1024]]
+        stats['chunks'][i] = len(chunks)
+        chunk_texts.extend(chunks)
+        owners.extend([i] * len(chunks))
+    stats['total_chunks'] = len(chunk_texts)
+    stats['chunk_seconds'] = time.perf_counter() - started
+
+    # Map: summarize every chunk of every article together
+    started = time.perf_counter()
+    chunk_summaries = summarize_batch(chunk_texts, max_length, batch_size, max_chars=None)
+    stats['map_seconds'] = time.perf_counter() - started
+
+    grouped = defaultdict(list)
+    for owner, summary in zip(owners, chunk_summaries):
+        grouped[owner].append(summary)
+
+    # Reduce: summarize the joined chunk summaries of multi-chunk articles
+    started = time.perf_counter()
+    to_reduce = []
+    for i, parts in grouped.items():
+        if len(parts) == 1 or not reduce:
+            summaries[i] = ' '.join(parts)
+        else:
+            to_reduce.append(i)
+    if to_reduce:
+        reduced = summarize_batch([' '.join(grouped[i]) for i in to_reduce],
+                                  max_length, batch_size, max_chars=None)
+        for i, summary in zip(to_reduce, reduced):
+            summaries[i] = summary
+    stats['reduce_seconds'] = time.perf_counter() - started
+
+    for i, summary in enumerate(summaries):
+        if summary is None:
+            summaries[i] = texts[i][:max_length] + "..."
+
+    return summaries, stats
+
+_SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+(?=["\'(A-Z0-9])')
+
+def _split_sentences(text):
+    """Sentences of a text, without fragments shorter than three words"""
+    return [sentence.strip() for sentence in _SENTENCE_PATTERN.split(text)
+            if len(sentence.split()) >= 3]
+
+def extractive_summarize_batch(texts, max_length=150):
+    """
+    Centroid extractive summarization.
+    The sentences of all texts go into one TF-IDF matrix. Each sentence is scored
+    by cosine similarity to the centroid of its own article, with a small bonus
+    for leading sentences. The best sentences are kept, in article order, within
+    the word budget matching summarize_batch's generation length.
+    """
+    summaries = [None] * len(texts)
+    sentences, owners = [], []
+    for i, text in enumerate(texts):
+        if len(text) < 50:  # Same short-text handling as summarize_batch
+            summaries[i] = text[:max_length] + "..." if len(text) > max_length else text
+            continue
+        parts = _split_sentences(text) or [text]
+        sentences.extend(parts)
+        owners.extend([i] * len(parts))
+    if not sentences:
+        return summaries
+
+    owners = np.asarray(owners)
+    # Index of each sentence within its article (owners is sorted)
+    positions = np.arange(len(owners)) - np.searchsorted(owners, owners)
+    try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from scipy.sparse import csr_matrix
+
+        X = TfidfVectorizer(stop_words=models.get_stopwords(), sublinear_tf=True).fit_transform(sentences)
+        # Article centroids as sums of their L2-normalized sentence rows
+        membership = csr_matrix((np.ones(len(owners)), (owners, np.arange(len(owners)))),
+                                shape=(len(texts), len(owners)))
+        centroids = (membership @ X).tocsr()
+        norms = np.sqrt(np.asarray(centroids.multiply(centroids).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        scores = np.asarray(X.multiply(centroids[owners]).sum(axis=1)).ravel() / norms[owners]
+        scores = scores + 0.1 / (1 + positions)
+    except Exception as e:
+        logger.error(f"Extractive scoring failed, keeping lead sentences: {str(e)}")
+        scores = -positions.astype(float)
+
+    lengths = np.array([len(sentence.split()) for sentence in sentences])
+    for i in np.unique(owners):
+        members = np.flatnonzero(owners == i)
+        # Generation lengths are in tokens; about three words per four tokens
+        budget = _summary_length(texts[i], max_length) * 3 // 4
+        chosen, words = [], 0
+        for j in members[np.argsort(-scores[members], kind="stable")]:
+            if words and words + lengths[j] > budget:
+                continue
+            chosen.append(j)
+            words += lengths[j]
+        summaries[i] = ' '.join(sentences[j] for j in sorted(chosen))
+    return summaries
+
+def merge_summary_stats(stats_list):
+    """
+    Combine the summarization stats of several batches: counts and timings
+    add up, per-article lists are concatenated. None if no batch had stats.
+    """
+    def merge(a, b):
+        if a is None or b is None:
+            return b if a is None else a
+        if isinstance(a, dict):
+            return {key: merge(a.get(key), b.get(key)) for key in {**a, **b}}
+        if isinstance(a, list):
+            return a + b
+        if isinstance(a, (int, float)):
+            return a + b
+        return a
+
+    merged = None
+    for stats in stats_list:
+        merged = merge(merged, stats)
+    return merged
+
+def summary_tier(tier=None):
+    """The given summarization tier if valid, otherwise the configured default"""
+    return tier if tier in SUMMARY_TIERS else SUMMARY_TIER
+
+def _route_abstractive(texts, tier):
+    """Indices of the texts the abstractive model summarizes in the given tier"""
+    if tier == "quality":
+        return list(range(len(texts)))
+    if tier == "fast":
+        return []
+
+    routed = {i for i, text in enumerate(texts) if len(text.split()) >= SUMMARY_ROUTE_MIN_WORDS}
+    rest = [i for i, text in enumerate(texts) if i not in routed and len(text) >= 50]
+    if SUMMARY_ROUTE_TOP_K and rest:
+        # The most central articles best represent the coverage
+        try:
+            from sklearn.base import clone
+
+            X = clone(_topic_vectorizer_template()).fit_transform(texts)
+            centroid = np.asarray(X.mean(axis=0)).ravel()
+            centrality = X[rest] @ centroid
+            top = np.argsort(-centrality, kind="stable")[:SUMMARY_ROUTE_TOP_K]
+            routed.update(rest[k] for k in top)
+        except Exception as e:
+            logger.error(f"Summary routing failed: {str(e)}")
+    return sorted(routed)
+
+def _sentiment_result(result):
+    """Convert a classifier output into the API sentiment format"""
+    return {
+        'sentiment': result['label'].capitalize(),
+        'score': float(result['score'])
+    }
+
+def _analyze_sentiment_one(text):
+    """Classify a single text, returning Neutral on failure"""
+    try:
+        return _sentiment_result(models.get_sentiment_analyzer()(text[:512])[0])
+    except Exception as e:
+        logger.error(f"Sentiment analysis failed: {str(e)}")
+        return {'sentiment': 'Neutral', 'score': 0.0}
+
+def analyze_sentiment_batch(texts, batch_size=None):
+    """
+    Classify a list of texts with batched model calls.
+    Inputs are sorted by length before batching to limit padding. Results match
+    analyze_sentiment.
+    """
+    batch_size = batch_size or MODEL_BATCH_SIZE
+    results = [{'sentiment': 'Neutral', 'score': 0.0} for _ in texts]
+
+    # Minimum text length for meaningful analysis
+    indices = [i for i, text in enumerate(texts) if len(text) >= 20]
+    indices.sort(key=lambda i: len(texts[i][:512]))
+    if not indices:
+        return results
+
+    metrics.observe_batch("sentiment_analyzer", len(indices))
+    try:
+        outputs = models.get_sentiment_analyzer()([texts[i][:512] for i in indices], batch_size=batch_size)
+        for i, output in zip(indices, outputs):
+            results[i] = _sentiment_result(output)
+    except Exception as e:
+        logger.error(f"Batched sentiment analysis failed, retrying per article: {str(e)}")
+        for i in indices:
+            results[i] = _analyze_sentiment_one(texts[i])
+
+    return results
 
 def analyze_sentiment(text):
     """Robust sentiment analysis with error handling"""
+    return analyze_sentiment_batch([text])[0]
+
+def _sentiment_windows(text, window_tokens, overlap, max_windows):
+    """Split text into overlapping token windows using the classifier's tokenizer"""
+    tokenizer = models.get_sentiment_analyzer().tokenizer
+    token_ids = tokenizer(text, add_special_tokens=False, verbose=False)['input_ids']
+    step = max(1, window_tokens - overlap)
+    windows = []
+    for start in range(0, max(len(token_ids) - overlap, 1), step):
+        if len(windows) >= max_windows:
+            break
+        window_ids = token_ids[start:start + window_tokens]
+        window = tokenizer.decode(window_ids, skip_special_tokens=True)
+        if window.strip():
+            windows.append((window, len(window_ids)))
+    return windows
+
+def _aggregate_windows(window_results, aggregation):
+    """Combine per-window classifier outputs into one label and score"""
+    if aggregation == "max":
+        best = max(window_results, key=lambda w: w['score'])
+        return best['label'], best['score']
+
+    # Length-weighted: each label collects score mass in proportion to window size
+    total_weight = sum(w['tokens'] for w in window_results)
+    label_mass = defaultdict(float)
+    for w in window_results:
+        label_mass[w['label']] += w['score'] * w['tokens']
+    label = max(label_mass, key=label_mass.get)
+    return label, label_mass[label] / total_weight
+
+def analyze_sentiment_windowed(texts, aggregation=None, window_tokens=None, overlap=None,
+                               max_windows=None, return_windows=False, batch_size=None):
+    """
+    Sentiment over the full article text using overlapping token windows.
+    The windows of all texts are classified in one batch and combined per text,
+    either length-weighted ("weighted") or by the most confident window ("max").
+    Each result has the same sentiment/score keys as analyze_sentiment; with
+    return_windows the per-window labels, scores and token counts are added.
+    """
+    aggregation = aggregation or SENTIMENT_AGGREGATION
+    window_tokens = window_tokens or SENTIMENT_WINDOW_TOKENS
+    overlap = SENTIMENT_WINDOW_OVERLAP if overlap is None else overlap
+    max_windows = max_windows or SENTIMENT_MAX_WINDOWS
+    batch_size = batch_size or MODEL_BATCH_SIZE
+
+    # Leave room for the classifier's special tokens
     try:
+        model_limit = getattr(models.get_sentiment_analyzer().tokenizer, 'model_max_length', window_tokens)
+    except Exception as e:
+        logger.error(f"Windowed sentiment analysis failed: {str(e)}")
+        return analyze_sentiment_batch(texts)
+    window_tokens = max(16, min(window_tokens, model_limit - 2))
+    overlap = min(overlap, window_tokens // 2)
+
+    results = [{'sentiment': 'Neutral', 'score': 0.0} for _ in texts]
+    window_texts, owners, sizes = [], [], []
+    for i, text in enumerate(texts):
         if len(text) < 20:  # Minimum text length for meaningful analysis
-            return {'sentiment': 'Neutral', 'score': 0.0}
-            
-        result = sentiment_analyzer(text[:512])[0]
-        return {
-            'sentiment': result['label'].capitalize(),
-            'score': float(result['score'])
-        }
+            continue
+        try:
+            windows = _sentiment_windows(text, window_tokens, overlap, max_windows)
+        except Exception as e:
+            logger.error(f"Windowing failed, falling back to truncation: {str(e)}")
+            windows = [(text[:512], 1)]
+        for window, size in windows:
+            window_texts.append(window)
+            owners.append(i)
+            sizes.append(size)
+
+    if not window_texts:
+        return results
+
+    # Classify all windows together, shortest first to limit padding
+    order = sorted(range(len(window_texts)), key=lambda j: len(window_texts[j]))
+    metrics.observe_batch("sentiment_analyzer", len(window_texts))
+    try:
+        outputs = models.get_sentiment_analyzer()([window_texts[j] for j in order],
+                                     batch_size=batch_size, truncation=True)
     except Exception as e:
-        logger.error(f"Sentiment analysis failed: {str(e)}")
-        return {'sentiment': 'Neutral', 'score': 0.0}
+        logger.error(f"Windowed sentiment analysis failed: {str(e)}")
+        return [analyze_sentiment(text) for text in texts]
+
+    per_text = defaultdict(list)
+    for j, output in sorted(zip(order, outputs), key=lambda pair: pair[0]):
+        per_text[owners[j]].append({
+            'label': output['label'].capitalize(),
+            'score': float(output['score']),
+            'tokens': sizes[j]
+        })
+
+    for i, window_results in per_text.items():
+        label, score = _aggregate_windows(window_results, aggregation)
+        results[i] = {'sentiment': label, 'score': float(score)}
+        if return_windows:
+            results[i]['windows'] = window_results
+
+    return results
+
+@lru_cache(maxsize=1)
+def _topic_vectorizer_template():
+    """Unfitted TF-IDF vectorizer with the shared topic configuration"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(
+        stop_words=models.get_stopwords(),
+        ngram_range=(1, 2),
+        min_df=1,
+        token_pattern=r'(?u)\b[a-zA-Z]{3,}\b'  # Only words with 3+ letters
+    )
+
+def _top_k_per_row(X, k):
+    """
+    Select the k highest-weighted columns of every row of a CSR matrix.
+    Returns (rows, cols) arrays ordered by row, then by descending weight.
+    Ties are broken by column index so results are deterministic.
+    """
+    row_lengths = np.diff(X.indptr)
+    rows = np.repeat(np.arange(X.shape[0]), row_lengths)
+    order = np.lexsort((X.indices, -X.data, rows))
+    sorted_rows = rows[order]
+    rank = np.arange(len(order)) - X.indptr[sorted_rows]
+    keep = order[rank < k]
+    return rows[keep], X.indices[keep]
+
+def extract_topics_corpus(texts, num_topics=5, num_common=5):
+    """
+    Corpus-level topic extraction.
+    Fits one TF-IDF vectorizer over all texts so topics are distinctive for each
+    article, picks the top topics per row on the sparse matrix, and counts the
+    common topics from the same selection. Texts shorter than 100 characters get
+    no topics. Returns a dict with per-text 'topics' and 'common_topics'.
+    """
+    result = {'topics': [[] for _ in texts], 'common_topics': []}
+    # Minimum text length for topic extraction
+    indices = [i for i, text in enumerate(texts) if len(text) >= 100]
+    if not indices:
+        return result
 
-def extract_topics(text, num_topics=5):
-    """Improved topic extraction with better preprocessing"""
     try:
-        if len(text) < 100:  # Minimum text length for topic extraction
-            return []
-            
-        vectorizer = CountVectorizer(
-            stop_words=list(stopwords.words('english')),
-            ngram_range=(1, 2),
-            min_df=1,
-            token_pattern=r'(?u)\b[a-zA-Z]{3,}\b'  # Only words with 3+ letters
-        )
-        
-        X = vectorizer.fit_transform([text])
+        from sklearn.base import clone
+        from scipy.sparse import csr_matrix
+
+        vectorizer = clone(_topic_vectorizer_template())
+        X = vectorizer.fit_transform([texts[i] for i in indices]).tocsr()
         words = vectorizer.get_feature_names_out()
-        counts = X.toarray()[0]
-        
-        return [word for word, _ in sorted(zip(words, counts), 
-                key=lambda x: x[1], reverse=True)[:num_topics]]
-        
+
+        rows, cols = _top_k_per_row(X, num_topics)
+        for row, col in zip(rows, cols):
+            result['topics'][indices[row]].append(str(words[col]))
+
+        # Count how many articles selected each topic, straight from the selection
+        selected = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=X.shape)
+        counts = np.asarray(selected.sum(axis=0)).ravel()
+        topic_cols = np.flatnonzero(counts)
+        topic_cols = topic_cols[np.lexsort((topic_cols, -counts[topic_cols]))][:num_common]
+        result['common_topics'] = [(str(words[col]), int(counts[col])) for col in topic_cols]
     except Exception as e:
         logger.error(f"Topic extraction failed: {str(e)}")
-        return []
 
-def perform_comparative_analysis(articles_data):
-    """Fault-tolerant comparative analysis"""
+    return result
+
+def extract_topics(text, num_topics=5):
+    """Improved topic extraction with better preprocessing"""
+    return extract_topics_corpus([text], num_topics=num_topics)['topics'][0]
+
+def infer_articles(contents, tier=None):
+    """
+    Run every model stage over a list of article texts.
+    Top-level so it can be submitted to a process pool. Returns the summaries,
+    summarization stats (None for the "quality" tier unless SUMMARY_MODE is
+    "chunked"), sentiments and the corpus topic result.
+    """
+    summaries, summary_stats, sentiments = _infer_models(contents, tier)
+    with metrics.span("topics"):
+        topic_result = extract_topics_corpus(contents)
+    return summaries, summary_stats, sentiments, topic_result
+
+def infer_shared(contents, corpora=(), tier=None):
+    """
+    Run the summarization and sentiment models once over contents, shared by
+    several companies, and fit topics separately on each corpus (a list of texts
+    per company). Top-level so it can be submitted to a process pool. Returns the
+    summaries, sentiments and one topic result per corpus.
+    """
+    if not contents:
+        return [], [], extract_topics_corpora(corpora)
+    summaries, _, sentiments = _infer_models(contents, tier)
+    return summaries, sentiments, extract_topics_corpora(corpora)
+
+def extract_topics_corpora(corpora):
+    """One corpus topic result per list of texts; top-level for the process pool"""
+    with metrics.span("topics"):
+        return [extract_topics_corpus(corpus) for corpus in corpora]
+
+def _infer_models(contents, tier=None):
+    """Summaries, summarization stats and sentiments for a list of texts"""
+    with metrics.span("summarize"):
+        summaries, summary_stats = summarize_tiered(contents, tier)
+    return summaries, summary_stats, infer_sentiments(contents)
+
+def summarize_tiered(contents, tier=None, abstractive=None):
+    """
+    Summaries in the given tier (see SUMMARY_TIER). Returns the summaries and
+    stats; for "fast" and "balanced" the stats count the articles per method.
+    abstractive maps texts to (summaries, stats) and defaults to the cached
+    model path.
+    """
+    tier = summary_tier(tier)
+    abstractive = abstractive or _abstractive_summaries
+    if tier == "quality":
+        return abstractive(contents)
+
+    routed = _route_abstractive(contents, tier)
+    summaries = [None] * len(contents)
+    chunk_stats = None
+    if routed:
+        routed_summaries, chunk_stats = abstractive([contents[i] for i in routed])
+        for i, summary in zip(routed, routed_summaries):
+            summaries[i] = summary
+    others = sorted(set(range(len(contents))) - set(routed))
+    for i, summary in zip(others, extractive_summarize_batch([contents[i] for i in others])):
+        summaries[i] = summary
+
+    stats = {"tier": tier, "abstractive": len(routed), "extractive": len(others)}
+    if chunk_stats is not None:
+        stats["chunked"] = chunk_stats
+    return summaries, stats
+
+def _abstractive_summaries(contents):
+    """Abstractive summaries in the configured SUMMARY_MODE, through the model cache"""
+    if SUMMARY_MODE == "chunked":
+        summary_settings = f"chunked:{SUMMARY_TOKEN_BUDGET}:{SUMMARY_MAX_CHUNKS}:{SUMMARY_CHUNK_TOKENS}"
+        def summarize(texts):
+            summaries, stats = summarize_long_batch(texts)
+            logger.info(f"Chunked summarization stats: {stats}")
+            return summaries, stats
+    else:
+        summary_settings = "truncate"
+        def summarize(texts):
+            return summarize_batch(texts), None
+
+    return _cached_model_outputs("summarizer", summary_settings, contents, summarize)
+
+def infer_sentiments(contents):
+    """Sentiments for a list of texts in the configured SENTIMENT_MODE, through the model cache"""
+    if SENTIMENT_MODE == "windowed":
+        sentiment_settings = (f"windowed:{SENTIMENT_AGGREGATION}:{SENTIMENT_WINDOW_TOKENS}:"
+                              f"{SENTIMENT_WINDOW_OVERLAP}:{SENTIMENT_MAX_WINDOWS}:"
+                              f"{int(SENTIMENT_RETURN_WINDOWS)}")
+        def classify(texts):
+            return analyze_sentiment_windowed(texts, return_windows=SENTIMENT_RETURN_WINDOWS), None
+    else:
+        sentiment_settings = "truncate"
+        def classify(texts):
+            return analyze_sentiment_batch(texts), None
+
+    with metrics.span("sentiment"):
+        sentiments, _ = _cached_model_outputs(
+            "sentiment_analyzer", sentiment_settings, contents, classify)
+    return sentiments
+
+def _cached_model_outputs(model_name, settings, contents, run):
+    """
+    Look up each content's output in the model cache and run the model only on
+    the misses. run(texts) must return (outputs, stats).
+    """
+    model = models.model_id(model_name)
+    keys = [cache.model_key(model, settings, content) for content in contents]
+    outputs = [cache.model_cache.get(key) for key in keys]
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    stats = None
+    if missing:
+        computed, stats = run([contents[i] for i in missing])
+        for i, output in zip(missing, computed):
+            outputs[i] = output
+            cache.model_cache.set(keys[i], output)
+    return outputs, stats
+
+def perform_comparative_analysis(articles_data, common_topics=None):
+    """
+    Fault-tolerant comparative analysis.
+    Pass common_topics from extract_topics_corpus to skip recounting the topics.
+    """
     analysis = {
         "sentiment_distribution": defaultdict(int),
         "average_sentiment_score": 0.0,
@@ -252,12 +828,15 @@ def perform_comparative_analysis(articles_data):
             analysis["average_sentiment_score"] = round(np.nanmean(sentiment_scores), 2)
         
         # Topic analysis
-        topic_counts = defaultdict(int)
-        for article in articles_data:
-            for topic in article.get('topics', []):
-                topic_counts[topic] += 1
-        analysis["common_topics"] = sorted(topic_counts.items(), 
-                                         key=lambda x: x[1], reverse=True)[:5]
+        if common_topics is not None:
+            analysis["common_topics"] = list(common_topics)[:5]
+        else:
+            topic_counts = defaultdict(int)
+            for article in articles_data:
+                for topic in article.get('topics', []):
+                    topic_counts[topic] += 1
+            analysis["common_topics"] = sorted(topic_counts.items(), 
+                                             key=lambda x: x[1], reverse=True)[:5]
 
     except Exception as e:
         logger.error(f"Comparative analysis failed: {str(e)}")
@@ -277,19 +856,57 @@ def _get_common_topics(articles_data):
 
 
 
-def translate_to_hindi(text):
-    """Translates English text to Hindi."""
-    translator = Translator()
-    hindi_text = translator.translate(text, src='en', dest='hi').text
-    return hindi_text
+def translate_to_hindi(text, values=None):
+    """Translates English text to Hindi; with values, text is a template filled after translation."""
+    with metrics.span("translate"):
+        return translation.get_service().translate(text, src='en', dest='hi', values=values)
+
+def speech_id(text, lang):
+    """Content address of the speech for a text and language"""
+    return hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).hexdigest()[:32]
 
-def generate_hindi_speech(text, output_file="output.mp3"):
-    """Generate Hindi speech from text and save to file."""
+def _render_speech(text, lang):
+    """MP3 bytes for text from the configured TTS backend"""
+    if TTS_BACKEND == "stub":
+        if TTS_STUB_DELAY:
+            time.sleep(TTS_STUB_DELAY)
+        return b"ID3" + text.encode("utf-8")
+    from gtts import gTTS
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buffer)  # Generate speech using gTTS
+    return buffer.getvalue()
+
+def synthesize_speech(text, lang='hi'):
+    """
+    Return the cache id of the speech for text, synthesizing it only if it is not
+    cached yet. Concurrent calls for the same text wait for one synthesis.
+    """
+    audio_id = speech_id(text, lang)
+    if cache.audio_cache.get(audio_id) is not None:
+        return audio_id
+
+    with _session_lock:
+        lock = _speech_locks.setdefault(audio_id, threading.Lock())
     try:
-        hindi_text = translate_to_hindi(text)  # Translate English text to Hindi
-        tts = gTTS(text=hindi_text, lang='hi')  # Generate speech using gTTS
-        tts.save(output_file)  # Save as MP3 file
-        return output_file, hindi_text
+        with lock:
+            if cache.audio_cache.get(audio_id) is None:
+                with metrics.span("tts"):
+                    audio = _render_speech(text, lang)
+                cache.audio_cache.set(audio_id, audio)
+    finally:
+        with _session_lock:
+            _speech_locks.pop(audio_id, None)
+    return audio_id
+
+def get_speech(audio_id):
+    """MP3 bytes for a synthesized speech id, or None if unknown or evicted"""
+    return cache.audio_cache.get(audio_id)
+
+def generate_hindi_speech(text, values=None):
+    """Generate Hindi speech from text (or a template and its values), returning its audio id and the Hindi text."""
+    try:
+        hindi_text = translate_to_hindi(text, values)  # Translate English text to Hindi
+        return synthesize_speech(hindi_text, lang='hi'), hindi_text
     except Exception as e:
         logger.error(f"Failed to generate Hindi speech: {str(e)}")
         return None, None
@@ -307,3 +924,11 @@ def preprocess_data(data):
         if math.isnan(data) or math.isinf(data):
             return 0
     return data
+
+def __getattr__(name):
+    """Keep utils.summarizer / utils.sentiment_analyzer working as lazy attributes"""
+    if name == "summarizer":
+        return models.get_summarizer()
+    if name == "sentiment_analyzer":
+        return models.get_sentiment_analyzer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,490 @@
+"""
+Incremental watch mode for a set of companies.
+
+Every WATCH_INTERVAL seconds each watched company is searched again. Articles
+whose URL is already in the persistent seen index are only re-fetched once their
+last check is WATCH_RECHECK seconds old. Of the fetched articles, only new URLs
+and pages whose content hash changed are scored. A copy of content already
+indexed for the company (same hash, different URL) is recorded as seen but not
+scored again, and so is a near-duplicate of an article scored within the window:
+the MinHash signature of every scored article is kept in the index and checked
+against DEDUP_THRESHOLD, as dedup.py does for one analysis.
+
+Scored articles feed a RollingAggregate per company holding the sentiment
+distribution, average score and topic counts of perform_comparative_analysis
+over the last WATCH_WINDOW seconds. The aggregate is updated as articles enter,
+change or leave the window, so reading it never runs the pipeline.
+The index and the scored articles live in WATCH_DB_PATH; aggregates are rebuilt
+from it on start.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+import analysis
+import cache
+import dedup
+import metrics
+import utils
+import workers
+
+logger = logging.getLogger(__name__)
+
+WATCH_DB_PATH = os.environ.get("WATCH_DB_PATH", "watch.sqlite3")
+WATCH_INTERVAL = float(os.environ.get("WATCH_INTERVAL", 15 * 60))
+WATCH_WINDOW = float(os.environ.get("WATCH_WINDOW", 7 * 24 * 3600))
+WATCH_RECHECK = float(os.environ.get("WATCH_RECHECK", 6 * 3600))
+# Comma-separated companies watched from the start, in addition to those added through the API
+WATCH_COMPANIES = os.environ.get("WATCH_COMPANIES", "")
+
+
+class RollingAggregate:
+    """
+    Sentiment distribution, score average and topic counts over a sliding time
+    window, updated per article instead of recomputed. Each URL counts once; a
+    changed article replaces its earlier record.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.distribution = Counter()
+        self.topic_counts = Counter()
+        self.score_sum = 0.0
+        self.total = 0
+        self.updated_at = None
+        # (timestamp, url) in arrival order, and the live record of each URL
+        self._events = deque()
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def _apply(self, record, sign):
+        _, sentiment, score, topics = record
+        self.distribution[sentiment] += sign
+        if not self.distribution[sentiment]:
+            del self.distribution[sentiment]
+        for topic in topics:
+            self.topic_counts[topic] += sign
+            if not self.topic_counts[topic]:
+                del self.topic_counts[topic]
+        self.score_sum += sign * score
+        self.total += sign
+
+    def add(self, url, timestamp, sentiment, score, topics):
+        """Add or replace the record of one article; timestamps must not decrease"""
+        record = (timestamp, sentiment, float(score), tuple(topics))
+        with self._lock:
+            previous = self._records.get(url)
+            if previous is not None:
+                self._apply(previous, -1)
+            self._records[url] = record
+            self._apply(record, 1)
+            self._events.append((timestamp, url))
+            self.updated_at = timestamp
+
+    def discard(self, url):
+        """Remove the record of an article, e.g. one that became a copy of another"""
+        with self._lock:
+            record = self._records.pop(url, None)
+            if record is not None:
+                self._apply(record, -1)
+
+    def expire(self, now=None):
+        """Drop the records that have left the window"""
+        cutoff = (now or time.time()) - self.window
+        with self._lock:
+            while self._events and self._events[0][0] <= cutoff:
+                timestamp, url = self._events.popleft()
+                record = self._records.get(url)
+                # Superseded events have a newer record for the same URL
+                if record is not None and record[0] == timestamp:
+                    self._apply(record, -1)
+                    del self._records[url]
+
+    def snapshot(self, now=None):
+        """Current aggregates, in the shape of perform_comparative_analysis"""
+        self.expire(now)
+        with self._lock:
+            return {
+                "sentiment_distribution": dict(self.distribution),
+                "average_sentiment_score": round(self.score_sum / self.total, 2) if self.total else 0.0,
+                "common_topics": self.topic_counts.most_common(5),
+                "total_articles": self.total,
+                "window_seconds": self.window,
+                "updated_at": self.updated_at
+            }
+
+
+class WatchStore:
+    """SQLite seen-URL/content-hash index and scored articles of the watched companies"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_companies (company TEXT PRIMARY KEY, name TEXT, added_at REAL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_articles ("
+            "company TEXT, url TEXT, content_hash TEXT, sentiment TEXT, score REAL, topics TEXT, "
+            "checked_at REAL, scored_at REAL, signature BLOB, PRIMARY KEY (company, url))")
+        # Add the signature column to tables created before signatures were stored
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(watch_articles)")]
+        if "signature" not in columns:
+            self._conn.execute("ALTER TABLE watch_articles ADD COLUMN signature BLOB")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS watch_articles_hash ON watch_articles (company, content_hash)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS watch_articles_scored ON watch_articles (company, scored_at)")
+
+    def companies(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT company, name FROM watch_companies").fetchall())
+
+    def add_company(self, company, name):
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO watch_companies VALUES (?, ?, ?)",
+                               (company, name, time.time()))
+
+    def remove_company(self, company):
+        with self._lock:
+            self._conn.execute("DELETE FROM watch_companies WHERE company = ?", (company,))
+            self._conn.execute("DELETE FROM watch_articles WHERE company = ?", (company,))
+
+    def seen(self, company, urls):
+        """{url: (content_hash, checked_at)} for the already indexed URLs"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(urls), 500):
+                batch = urls[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT url, content_hash, checked_at FROM watch_articles "
+                    f"WHERE company = ? AND url IN ({','.join('?' * len(batch))})",
+                    (company, *batch)).fetchall()
+                found.update((url, (content_hash, checked_at)) for url, content_hash, checked_at in rows)
+        return found
+
+    def has_hash(self, company, content_hash):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM watch_articles WHERE company = ? AND content_hash = ? LIMIT 1",
+                (company, content_hash)).fetchone() is not None
+
+    def mark_checked(self, company, urls, checked_at):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE watch_articles SET checked_at = ? WHERE company = ? AND url = ?",
+                [(checked_at, company, url) for url in urls])
+
+    def mark_copy(self, company, url, content_hash, checked_at):
+        """Index a URL whose content was already scored under another URL"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watch_articles VALUES (?, ?, ?, NULL, NULL, NULL, ?, NULL, NULL)",
+                (company, url, content_hash, checked_at))
+
+    def save_scored(self, company, records, signatures=None):
+        """
+        records: (url, content_hash, sentiment, score, topics, timestamp) tuples,
+        signatures: their MinHash signature matrix, if computed
+        """
+        if signatures is None:
+            signatures = [None] * len(records)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO watch_articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(company, url, content_hash, sentiment, score, json.dumps(list(topics)), timestamp, timestamp,
+                  signature.tobytes() if signature is not None else None)
+                 for (url, content_hash, sentiment, score, topics, timestamp), signature in zip(records, signatures)])
+
+    def signatures_since(self, company, since):
+        """URLs and MinHash signature matrix of the articles scored after since"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, signature FROM watch_articles "
+                "WHERE company = ? AND scored_at > ? AND signature IS NOT NULL", (company, since)).fetchall()
+        # Signatures stored under another DEDUP_NUM_PERM are not comparable
+        rows = [(url, signature) for url, signature in rows if len(signature) == dedup.DEDUP_NUM_PERM * 8]
+        signatures = np.frombuffer(b"".join(signature for _, signature in rows), dtype=np.uint64)
+        return [url for url, _ in rows], signatures.reshape(len(rows), dedup.DEDUP_NUM_PERM)
+
+    def scored_since(self, company, since):
+        """(url, scored_at, sentiment, score, topics) of articles scored after since, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, scored_at, sentiment, score, topics FROM watch_articles "
+                "WHERE company = ? AND scored_at > ? ORDER BY scored_at", (company, since)).fetchall()
+        return [(url, scored_at, sentiment, score, json.loads(topics))
+                for url, scored_at, sentiment, score, topics in rows]
+
+
+def score_articles(contents):
+    """
+    Sentiment and topics of newly seen articles. Top-level so it can be
+    submitted to a process pool; topics are fitted on this batch.
+    """
+    sentiments = utils.infer_sentiments(contents)
+    with metrics.span("topics"):
+        topics = utils.extract_topics_corpus(contents)['topics']
+    return sentiments, topics
+
+
+def near_duplicates(contents, seen_signatures):
+    """
+    MinHash signatures of the articles to score and their matches among the
+    signatures of the scored ones. Top-level so it can be submitted to a process pool.
+    """
+    signatures = dedup.minhash_signatures(contents)
+    return signatures, dedup.match_signatures(signatures, seen_signatures)
+
+
+class Watcher:
+    """Watched companies, their rolling aggregates and the scheduler loop"""
+
+    def __init__(self, store, window=WATCH_WINDOW, recheck=WATCH_RECHECK):
+        self.store = store
+        self.window = window
+        self.recheck = recheck
+        self.aggregates = {}
+        self.names = {}
+        self.last_runs = {}
+        self._task = None
+        # One run at a time per company, and references to the runs started by schedule()
+        self._run_locks = {}
+        self._runs = set()
+        for company, name in store.companies().items():
+            self._load(company, name)
+        for name in WATCH_COMPANIES.split(","):
+            if name.strip():
+                self.add(name.strip())
+
+    def _load(self, company, name):
+        """Rebuild a company's aggregate from the articles scored within the window"""
+        aggregate = RollingAggregate(self.window)
+        for url, scored_at, sentiment, score, topics in self.store.scored_since(
+                company, time.time() - self.window):
+            aggregate.add(url, scored_at, sentiment, score, topics)
+        self.aggregates[company] = aggregate
+        self.names[company] = name
+
+    def add(self, name):
+        company = analysis.company_key(name)
+        if company not in self.aggregates:
+            self.store.add_company(company, name)
+            self._load(company, name)
+        return company
+
+    async def remove(self, name):
+        """
+        Stop watching a company. A run in progress sees the company is gone and
+        stops writing; its index is dropped once that run has released the lock.
+        """
+        company = analysis.company_key(name)
+        if company not in self.aggregates:
+            return False
+        self.aggregates.pop(company, None)
+        self.names.pop(company, None)
+        self.last_runs.pop(company, None)
+        async with self._run_lock(company):
+            # Re-added while the run finished: keep its index
+            if company in self.aggregates:
+                return True
+            await workers.run_io(self.store.remove_company, company)
+        if company not in self.aggregates:
+            self._run_locks.pop(company, None)
+        return True
+
+    def _watched(self, company):
+        return company in self.aggregates
+
+    def aggregate(self, name):
+        """Current aggregates of a watched company, or None"""
+        company = analysis.company_key(name)
+        aggregate = self.aggregates.get(company)
+        if aggregate is None:
+            return None
+        return {"company": self.names[company], **aggregate.snapshot(),
+                "last_run": self.last_runs.get(company)}
+
+    def all_aggregates(self):
+        return [self.aggregate(name) for name in list(self.names.values())]
+
+    def _run_lock(self, company):
+        return self._run_locks.setdefault(company, asyncio.Lock())
+
+    async def run_company(self, name):
+        """Search, fetch and score only what is new or changed for one company"""
+        company = self.add(name)
+        async with self._run_lock(company):
+            return await self._run_company(company, name)
+
+    async def _run_company(self, company, name):
+        """
+        The incremental run of one company. Returns None without writing anything
+        further once the company is removed during one of the awaits.
+        """
+        if not self._watched(company):
+            return None
+        started = time.perf_counter()
+        urls = await workers.run_io(utils.search_news, name)
+
+        now = time.time()
+        seen = await workers.run_io(self.store.seen, company, urls)
+        due = [url for url in urls if url not in seen or now - seen[url][1] >= self.recheck]
+        # Bypass the article cache so changed pages are seen
+        fetched = await workers.run_io(utils.fetch_articles, due, refresh=True) if due else []
+        if not self._watched(company):
+            return None
+
+        to_score, unchanged, copies, hashes = [], [], 0, set()
+        for article in fetched:
+            if len(article['content']) <= 100:
+                continue
+            content_hash = cache.content_hash(article['content'])
+            previous = seen.get(article['url'])
+            if previous is not None and previous[0] == content_hash:
+                unchanged.append(article['url'])
+            elif content_hash in hashes or await workers.run_io(self.store.has_hash, company, content_hash):
+                if not self._watched(company):
+                    return None
+                copies += 1
+                self.aggregates[company].discard(article['url'])
+                await workers.run_io(self.store.mark_copy, company, article['url'], content_hash, now)
+            else:
+                hashes.add(content_hash)
+                to_score.append((article, content_hash))
+        if not self._watched(company):
+            return None
+        if unchanged:
+            await workers.run_io(self.store.mark_checked, company, unchanged, now)
+
+        # Near-duplicates of articles scored within the window are copies too
+        signatures = None
+        if to_score and dedup.DEDUP_ENABLED:
+            urls_since, seen_signatures = await workers.run_io(
+                self.store.signatures_since, company, now - self.window)
+            # A changed article is not a copy of its own earlier version
+            changed = {article['url'] for article, _ in to_score}
+            keep = [i for i, url in enumerate(urls_since) if url not in changed]
+            signatures, matches = await workers.run_inference(
+                near_duplicates, [article['content'] for article, _ in to_score], seen_signatures[keep])
+            if not self._watched(company):
+                return None
+            unique = []
+            for i, ((article, content_hash), match) in enumerate(zip(to_score, matches)):
+                if match is None:
+                    unique.append(i)
+                    continue
+                if not self._watched(company):
+                    return None
+                copies += 1
+                self.aggregates[company].discard(article['url'])
+                await workers.run_io(self.store.mark_copy, company, article['url'], content_hash, now)
+            to_score, signatures = [to_score[i] for i in unique], signatures[unique]
+
+        if to_score:
+            sentiments, topics = await workers.run_inference(
+                score_articles, [article['content'] for article, _ in to_score])
+            if not self._watched(company):
+                return None
+            timestamp = time.time()
+            records = [
+                (article['url'], content_hash, sentiment['sentiment'], sentiment['score'], article_topics, timestamp)
+                for (article, content_hash), sentiment, article_topics in zip(to_score, sentiments, topics)
+            ]
+            await workers.run_io(self.store.save_scored, company, records, signatures)
+            aggregate = self.aggregates.get(company)
+            if aggregate is None:
+                return None
+            for url, _, sentiment, score, article_topics, _ in records:
+                aggregate.add(url, timestamp, sentiment, score, article_topics)
+            metrics.count_articles("analyzed", len(records))
+
+        self.last_runs[company] = {
+            "finished_at": time.time(),
+            "seconds": round(time.perf_counter() - started, 3),
+            "urls": len(urls),
+            "fetched": len(fetched),
+            "new": sum(1 for article, _ in to_score if article['url'] not in seen),
+            "changed": sum(1 for article, _ in to_score if article['url'] in seen),
+            "unchanged": len(urls) - len(due) + len(unchanged),
+            "copies": copies
+        }
+        return self.last_runs[company]
+
+    async def run_guarded(self, name):
+        """
+        run_company under the admission limit, logging instead of raising.
+        Skipped when a run of the company is already in progress.
+        """
+        if self._run_lock(self.add(name)).locked():
+            logger.info(f"Watch run for {name} already in progress")
+            return None
+        try:
+            async with workers.admission:
+                return await self.run_company(name)
+        except workers.Overloaded:
+            logger.error(f"Skipping watch run for {name}: server is overloaded")
+        except Exception as e:
+            logger.error(f"Watch run for {name} failed: {str(e)}")
+
+    async def run_all(self):
+        for company, name in list(self.names.items()):
+            # Skip companies removed while earlier ones ran
+            if self._watched(company):
+                await self.run_guarded(name)
+
+    async def run_forever(self, interval=WATCH_INTERVAL):
+        while True:
+            if self.names:
+                await self.run_all()
+            await asyncio.sleep(interval)
+
+    def start(self, interval=WATCH_INTERVAL):
+        """Start the scheduler on the running event loop; WATCH_INTERVAL=0 disables it"""
+        if interval > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self.run_forever(interval))
+        return self._task
+
+    def schedule(self, name):
+        """
+        Run a company soon: start the scheduler if it is not running (its first
+        pass covers the company), otherwise run the company in its own task.
+        """
+        if self._task is None and self.start() is not None:
+            return self._task
+        task = asyncio.ensure_future(self.run_guarded(name))
+        self._runs.add(task)
+        task.add_done_callback(self._runs.discard)
+        return task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._runs):
+            task.cancel()
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def get_watcher():
+    """Process-wide watcher on WATCH_DB_PATH"""
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                _watcher = Watcher(WatchStore(WATCH_DB_PATH))
+    return _watcher
+
+def stop_watcher():
+    """Stop the process-wide watcher if it was started"""
+    if _watcher is not None:
+        _watcher.stop()
@@ -0,0 +1,216 @@
+"""
+Executors that keep blocking work off the FastAPI event loop.
+
+Blocking network calls (search, fetch, translation, TTS) run on a bounded I/O
+thread pool. Model inference runs on a dedicated executor: a thread pool by
+default, or a process pool holding one model copy per worker when
+INFERENCE_EXECUTOR=process. Admission and queue-depth limits reject excess work
+with 429/503 instead of letting requests pile up.
+"""
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+IO_WORKERS = int(os.environ.get("IO_WORKERS", 16))
+INFERENCE_EXECUTOR = os.environ.get("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 1))
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", 4))
+MAX_CONCURRENT_ANALYSES = int(os.environ.get("MAX_CONCURRENT_ANALYSES", 4))
+MAX_QUEUED_ANALYSES = int(os.environ.get("MAX_QUEUED_ANALYSES", 8))
+
+
+class Overloaded(Exception):
+    """Raised when a request is rejected by an admission or queue-depth limit"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AdmissionLimiter:
+    """
+    Async context manager allowing max_active analyses at once with at most
+    max_queued more waiting; anything beyond that is rejected with 429.
+    """
+
+    def __init__(self, max_active, max_queued):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_active)
+        if self._semaphore.locked() and self.waiting >= self.max_queued:
+            raise Overloaded("Too many analyses in progress, retry later", 429)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class BoundedExecutor:
+    """Runs callables on an executor, rejecting with 503 past max_pending jobs"""
+
+    def __init__(self, factory, max_pending, name):
+        self._factory = factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self.max_pending = max_pending
+        self.name = name
+        self.pending = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._factory()
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        if self.max_pending and self.pending >= self.max_pending:
+            raise Overloaded(f"{self.name} queue is full, retry later", 503)
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            call = partial(fn, *args, **kwargs)
+            if not isinstance(self.executor, ProcessPoolExecutor):
+                # Threads see the caller's context variables (e.g. per-request timings)
+                call = partial(contextvars.copy_context().run, call)
+            return await loop.run_in_executor(self.executor, call)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _init_inference_worker():
+    """Load every model once in each inference process"""
+    import models
+    models.registry.warmup()
+
+def _warmup_inference_worker(barrier):
+    """
+    Warmup job: the process id and model load state of one inference process.
+    Waiting on the barrier keeps a worker from taking a second warmup job.
+    """
+    import models
+    status = models.registry.warmup()
+    try:
+        barrier.wait(timeout=600)
+    except Exception:
+        pass
+    return os.getpid(), models.registry.ready(), status
+
+def _make_inference_executor():
+    if INFERENCE_EXECUTOR == "process":
+        # Spawn rather than fork: this process already runs I/O and fetch threads,
+        # and a forked child can inherit their locks in a held state
+        return ProcessPoolExecutor(max_workers=INFERENCE_WORKERS,
+                                   mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_inference_worker)
+    return ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+def _make_io_executor():
+    return ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+
+admission = AdmissionLimiter(MAX_CONCURRENT_ANALYSES, MAX_QUEUED_ANALYSES)
+io_pool = BoundedExecutor(_make_io_executor, 0, "I/O")
+inference_pool = BoundedExecutor(_make_inference_executor, INFERENCE_MAX_PENDING, "Inference")
+
+# Model state reported by the inference processes at the last warmup
+_worker_status = {}
+_workers_ready = False
+
+def warmup_inference():
+    """
+    Load the models where inference runs and return (ready, status). With
+    INFERENCE_EXECUTOR=process this starts the pool and runs one warmup job per
+    worker, since the models live in the worker processes; otherwise the models
+    are loaded into this process.
+    """
+    global _workers_ready
+    import models
+
+    if INFERENCE_EXECUTOR != "process":
+        status = models.registry.warmup()
+        return models.registry.ready(), status
+
+    # Concurrent jobs make the pool start every worker; each loads its models first
+    executor = inference_pool.executor
+    ready = True
+    with multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(INFERENCE_WORKERS)
+        futures = [executor.submit(_warmup_inference_worker, barrier) for _ in range(INFERENCE_WORKERS)]
+        for future in futures:
+            try:
+                pid, worker_ready, status = future.result()
+            except Exception as e:
+                logger.error(f"Inference worker warmup failed: {str(e)}")
+                ready = False
+                continue
+            _worker_status[pid] = {"ready": worker_ready, "models": status}
+            ready = ready and worker_ready
+    _workers_ready = ready
+    return inference_status()
+
+def inference_status():
+    """(ready, status) of the models used for inference, in this process or the workers"""
+    import models
+
+    if INFERENCE_EXECUTOR != "process":
+        return models.registry.ready(), models.registry.status()
+    return _workers_ready, {"executor": "process", "workers": {str(pid): status
+                                                                for pid, status in _worker_status.items()}}
+
+async def run_io(fn, *args, **kwargs):
+    """Run a blocking network call on the I/O pool"""
+    return await io_pool.run(fn, *args, **kwargs)
+
+async def run_inference(fn, *args, **kwargs):
+    """Run model inference on the dedicated inference executor"""
+    return await inference_pool.run(fn, *args, **kwargs)
+
+def queue_depths():
+    """Current admission and executor queue depths"""
+    return {
+        "analyses_active": admission.active,
+        "analyses_waiting": admission.waiting,
+        "inference_pending": inference_pool.pending,
+        "io_pending": io_pool.pending
+    }
+
+def shutdown():
+    global _workers_ready
+    io_pool.shutdown()
+    inference_pool.shutdown()
+    _workers_ready = False
+    _worker_status.clear()